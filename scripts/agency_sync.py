@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Diff-based upserts for the agencies table
+
+The table holds two kinds of rows keyed by `agency_id`:
+- agency records (`dki-jakarta-kesehatan`)
+- keyword index rows (`keyword#<keyword>#<agency_id>`) projected into keyword-index
+
+Syncing computes which rows must be written or deleted so the table matches
+the given agencies, leaving unchanged rows untouched.
+"""
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+
+KEYWORD_PREFIX = "keyword#"
+META_PREFIX = "meta#"
+
+# Read by DynamoDBMatcher to invalidate its match memo
+DATA_VERSION_KEY = "meta#version"
+
+# Not compared when deciding whether a record changed
+VOLATILE_FIELDS = ("created_at", "updated_at")
+
+
+@dataclass
+class AgencyDiff:
+    puts: List[Dict] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not self.puts and not self.deletes
+
+    def summary(self) -> str:
+        records = sum(1 for item in self.puts if not item['agency_id'].startswith(KEYWORD_PREFIX))
+        return (
+            f"{records} records, {len(self.puts) - records} keyword rows to write; "
+            f"{len(self.deletes)} rows to delete"
+        )
+
+
+def keyword_row_id(keyword: str, agency_id: str) -> str:
+    return f"{KEYWORD_PREFIX}{keyword}#{agency_id}"
+
+
+def keyword_rows(agency: Dict) -> List[Dict]:
+    """Keyword index rows for an agency record"""
+    return [
+        {
+            'agency_id': keyword_row_id(keyword, agency['agency_id']),
+            'keyword': keyword,
+            'agency_ref': agency['agency_id']
+        }
+        for keyword in dict.fromkeys(agency.get('keywords') or [])
+    ]
+
+
+def _stable(item: Dict) -> Dict:
+    return {k: v for k, v in item.items() if k not in VOLATILE_FIELDS}
+
+
+def diff_agencies(agencies: Iterable[Dict], current_items: Iterable[Dict], prune: bool = False) -> AgencyDiff:
+    """
+    Computes the writes needed to make the table match `agencies`.
+
+    Args:
+        agencies: Desired agency records
+        current_items: Rows currently in the table (records and keyword rows)
+        prune: Also delete agencies (and their keyword rows) missing from `agencies`
+    """
+    desired = {agency['agency_id']: agency for agency in agencies}
+    current = {item['agency_id']: item for item in current_items if not item['agency_id'].startswith(META_PREFIX)}
+
+    diff = AgencyDiff()
+    wanted_rows = set()
+    for agency_id, agency in desired.items():
+        existing = current.get(agency_id)
+        if existing is None or _stable(existing) != _stable(agency):
+            item = dict(agency)
+            if existing is not None and existing.get('created_at'):
+                item['created_at'] = existing['created_at']
+            diff.puts.append(item)
+        for row in keyword_rows(agency):
+            wanted_rows.add(row['agency_id'])
+            if row['agency_id'] not in current:
+                diff.puts.append(row)
+
+    for row_id, item in current.items():
+        if row_id.startswith(KEYWORD_PREFIX):
+            owner = item.get('agency_ref')
+            if row_id not in wanted_rows and (owner in desired or prune):
+                diff.deletes.append(row_id)
+        elif prune and row_id not in desired:
+            diff.deletes.append(row_id)
+
+    return diff
+
+
+def scan_all(table) -> List[Dict]:
+    """Reads every row of the table, following pagination"""
+    items: List[Dict] = []
+    kwargs: Dict = {}
+    while True:
+        response = table.scan(**kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return items
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def existing_rows(table, agency_id: str) -> List[Dict]:
+    """Reads an agency record plus the keyword rows implied by its stored keywords"""
+    item = table.get_item(Key={'agency_id': agency_id}).get('Item')
+    if item is None:
+        return []
+    return [item] + keyword_rows(item)
+
+
+def apply_diff(table, diff: AgencyDiff):
+    """Applies a diff using DynamoDB batch writes"""
+    if diff.empty:
+        return
+    with table.batch_writer(overwrite_by_pkeys=['agency_id']) as batch:
+        for item in diff.puts:
+            batch.put_item(Item=item)
+        for agency_id in diff.deletes:
+            batch.delete_item(Key={'agency_id': agency_id})
+
+
+def bump_data_version(table) -> str:
+    """Marks the agencies data as changed so matcher memos are invalidated"""
+    version = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    table.put_item(Item={
+        'agency_id': DATA_VERSION_KEY,
+        'version': version,
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    })
+    return version
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: dict results vs slotted models with interned agency records
+
+Simulates the memoized match path (3 contacts per response) plus response
+serialization, and reports time and bytes allocated per response for the
+previous dict-copy path and the model path.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from models import AgencyRecord, ComplaintResult, Ministry, SocialHandleInfo
+from models.serialization import dumps, orjson
+
+SAMPLE_ITEM = {
+    'agency_id': 'dinas-kependudukan',
+    'name': 'Dinas Kependudukan DKI Jakarta',
+    'level': 'provincial',
+    'social_media': {'twitter': '@dukcapiljkt', 'instagram': '@dukcapiljkt', 'facebook': None},
+    'website': 'https://dukcapil.jakarta.go.id',
+    'phone': '(021) 1234567',
+    'email': None,
+    'keywords': ['ktp', 'kk', 'akta', 'dukcapil', 'e-ktp', 'kartu', 'keluarga'],
+}
+GENERATED_TEXT = "Mohon perhatiannya untuk pengurusan e-KTP yang sudah berbulan-bulan belum selesai. Terima kasih 🙏"
+RATIONALE = "Dinas Kependudukan disarankan karena keluhan Anda tentang 'e-ktp' dan 'dukcapil' terkait langsung dengan tanggung jawab mereka."
+
+
+def dict_path(items: List[Dict]) -> Callable[[], str]:
+    """Previous behaviour: memo holds dicts, every hit copies them, stdlib json.dumps"""
+    cached = [{
+        'name': item['name'],
+        'score': 0.5,
+        'description': f"{item['level']} level agency",
+        'social_media': item['social_media'],
+        'website': item['website'],
+        'phone': item['phone'],
+        'email': item['email'],
+        'matched_keywords': ['dukcapil', 'e-ktp'],
+        'match_confidence': 0.67
+    } for item in items]
+
+    def respond() -> str:
+        contacts = [dict(contact) for contact in cached]
+        return json.dumps({
+            'generated_text': GENERATED_TEXT,
+            'suggested_contacts': contacts,
+            'rationale': RATIONALE,
+            'social_handle_info': {'handle': '@dukcapiljkt', 'status': 'verified'}
+        })
+    return respond
+
+
+def model_path(items: List[Dict]) -> Callable[[], str]:
+    """Memo holds immutable Ministry objects referencing shared AgencyRecords"""
+    cached = [Ministry(
+        name=record.name,
+        score=0.5,
+        description=f"{record.level} level agency",
+        agency=record,
+        matched_keywords=('dukcapil', 'e-ktp'),
+        match_confidence=0.67
+    ) for record in (AgencyRecord.from_item(item) for item in items)]
+
+    def respond() -> str:
+        return dumps(ComplaintResult(
+            generated_text=GENERATED_TEXT,
+            suggested_contacts=list(cached),
+            rationale=RATIONALE,
+            social_handle_info=SocialHandleInfo(handle='@dukcapiljkt', status='verified')
+        ))
+    return respond
+
+
+def measure(respond: Callable[[], str], iterations: int) -> Dict[str, float]:
+    for _ in range(min(iterations, 1000)):
+        respond()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        respond()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    respond()  # warm up under tracing so one-off allocations aren't counted
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    respond()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return {'us_per_response': elapsed / iterations * 1e6, 'peak_bytes': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark result models and response serialization")
+    parser.add_argument('--iterations', type=int, default=50000)
+    args = parser.parse_args()
+
+    items = [dict(SAMPLE_ITEM, agency_id=f"{SAMPLE_ITEM['agency_id']}-{i}") for i in range(3)]
+    assert json.loads(dict_path(items)()) == json.loads(model_path(items)()), "paths must produce the same JSON"
+
+    print(f"\n{'='*60}")
+    print(f"MODELS BENCHMARK: {args.iterations} responses, 3 contacts each")
+    print(f"Serializer: {'orjson' if orjson is not None else 'stdlib json (compact)'}")
+    print(f"{'='*60}")
+    print(f"{'path':<10}{'µs/response':>14}{'peak bytes':>14}")
+    for name, respond in (('dicts', dict_path(items)), ('models', model_path(items))):
+        result = measure(respond, args.iterations)
+        print(f"{name:<10}{result['us_per_response']:>14.2f}{result['peak_bytes']:>14,}")
+
+
+if __name__ == '__main__':
+    main()
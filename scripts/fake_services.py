@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+In-process fakes for Serper, Bedrock and DynamoDB
+
+Used with `--fake` to run the scrapers and loaders locally without network
+access or AWS credentials.
+"""
+import io
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+FAKE_LATENCY_SECONDS = 0.05
+
+
+class FakeResponse:
+    def __init__(self, payload: Dict, status_code: int = 200):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self) -> Dict:
+        return self._payload
+
+
+class FakeSerperSession:
+    """Mimics `requests.Session.post` against the Serper search endpoint."""
+
+    def __init__(self, latency: float = FAKE_LATENCY_SECONDS):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def post(self, url: str, json: Optional[Dict] = None, headers: Optional[Dict] = None, timeout: float = None) -> FakeResponse:
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        query = (json or {}).get("q", "")
+        slug = re.sub(r"[^a-z0-9]+", "", query.lower())[:15]
+        return FakeResponse({
+            "searchParameters": {"q": query},
+            "organic": [
+                {
+                    "title": f"{query} - Official",
+                    "link": f"https://{slug}.go.id",
+                    "snippet": f"Official X: @{slug} Instagram: @{slug} Telp: (021) 1234567"
+                }
+            ]
+        })
+
+
+class FakeBedrockClient:
+    """Mimics `bedrock-runtime.invoke_model` for single and batched agency verification prompts."""
+
+    def __init__(self, latency: float = FAKE_LATENCY_SECONDS):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict:
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        prompt = json.loads(body)["messages"][0]["content"]
+        sections = re.findall(r'<agency id="(\d+)"[^>]*>(.*?)</agency>', prompt, re.DOTALL)
+        if sections:
+            text = json.dumps({agency_id: self._verify(section) for agency_id, section in sections})
+        else:
+            text = json.dumps(self._verify(prompt))
+        return {"body": io.BytesIO(json.dumps({"content": [{"type": "text", "text": text}]}).encode("utf-8"))}
+
+    @staticmethod
+    def _verify(search_results: str) -> Dict:
+        handles = re.findall(r"@(\w+)", search_results)
+        handle = f"@{handles[0]}" if handles else None
+        return {
+            "twitter": handle,
+            "instagram": handle,
+            "facebook": None,
+            "website": f"https://{handles[0]}.go.id" if handles else None,
+            "phone": "(021) 1234567",
+            "email": None,
+            "confidence": 0.9 if handle else 0.1,
+            "reasoning": "fake verification"
+        }
+
+
+class _FakeBatchWriter:
+    def __init__(self, table: "FakeTable"):
+        self._table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item: Dict):
+        self._table.put_item(Item=Item)
+
+    def delete_item(self, Key: Dict):
+        self._table.delete_item(Key=Key)
+
+
+class FakeTable:
+    """In-memory stand-in for the `agencies` DynamoDB table and its keyword-index GSI."""
+
+    def __init__(self, items: Optional[List[Dict]] = None, table_name: str = "agencies"):
+        self.name = self.table_name = table_name
+        self.items: Dict[str, Dict] = {}
+        self.writes = 0
+        self._lock = threading.Lock()
+        for item in items or []:
+            self.items[item["agency_id"]] = dict(item)
+
+    def put_item(self, Item: Dict, **kwargs) -> Dict:
+        with self._lock:
+            self.items[Item["agency_id"]] = dict(Item)
+            self.writes += 1
+        return {}
+
+    def get_item(self, Key: Dict, **kwargs) -> Dict:
+        with self._lock:
+            item = self.items.get(Key["agency_id"])
+        return {"Item": dict(item)} if item is not None else {}
+
+    def delete_item(self, Key: Dict, **kwargs) -> Dict:
+        with self._lock:
+            self.items.pop(Key["agency_id"], None)
+            self.writes += 1
+        return {}
+
+    def query(self, IndexName: str, ExpressionAttributeValues: Dict, **kwargs) -> Dict:
+        keyword = ExpressionAttributeValues[":kw"]
+        with self._lock:
+            items = [dict(i) for i in self.items.values() if i.get("keyword") == keyword]
+        return {"Items": items, "Count": len(items)}
+
+    def scan(self, **kwargs) -> Dict:
+        with self._lock:
+            items = [dict(i) for i in self.items.values()]
+        return {"Items": items, "Count": len(items)}
+
+    def batch_writer(self, **kwargs) -> _FakeBatchWriter:
+        return _FakeBatchWriter(self)
+
+
+class FakeDynamoResource:
+    """Mimics the boto3 DynamoDB service resource around a single FakeTable."""
+
+    def __init__(self, table: FakeTable):
+        self.table = table
+
+    def Table(self, name: str) -> FakeTable:
+        return self.table
+
+    def batch_get_item(self, RequestItems: Dict) -> Dict:
+        responses = {}
+        for name, request in RequestItems.items():
+            items = [self.table.get_item(Key=key).get("Item") for key in request["Keys"]]
+            responses[name] = [item for item in items if item is not None]
+        return {"Responses": responses, "UnprocessedKeys": {}}
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Bulk-load agencies from JSON/JSONL dumps into DynamoDB
+
+Computes the diff against the current table and applies it with batch
+writes. Re-running with unchanged input writes nothing.
+"""
+import argparse
+import json
+from decimal import Decimal
+from typing import Dict, List
+
+from agency_sync import apply_diff, bump_data_version, diff_agencies, scan_all
+from scrape_dki_agencies import get_table, use_fake_services
+
+
+def load_dump(path: str) -> List[Dict]:
+    """Reads agencies from a JSON array or a JSONL file"""
+    with open(path) as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        return json.loads(content, parse_float=Decimal)
+    return [json.loads(line, parse_float=Decimal) for line in content.splitlines() if line.strip()]
+
+
+def load_agencies(paths: List[str], prune: bool = False, dry_run: bool = False):
+    agencies: Dict[str, Dict] = {}
+    for path in paths:
+        for agency in load_dump(path):
+            agencies[agency['agency_id']] = agency
+    print(f"📄 Read {len(agencies)} agencies from {len(paths)} file(s)")
+
+    table = get_table()
+    current = scan_all(table)
+    print(f"📊 Table has {len(current)} rows")
+
+    diff = diff_agencies(agencies.values(), current, prune=prune)
+    print(f"🔎 Diff: {diff.summary()}")
+
+    if diff.empty:
+        print("✅ Table already up to date")
+    elif dry_run:
+        print("ℹ️  Dry run, nothing written")
+    else:
+        apply_diff(table, diff)
+        print(f"✅ Applied (data version {bump_data_version(table)})")
+    return diff
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk-load agencies into DynamoDB")
+    parser.add_argument('paths', nargs='+', help='JSON or JSONL agency dumps (e.g. dki_agencies.json)')
+    parser.add_argument('--prune', action='store_true', help='Delete agencies not present in the input')
+    parser.add_argument('--dry-run', action='store_true', help='Print the diff without writing')
+    parser.add_argument('--fake', action='store_true', help='Load into an in-memory table')
+    args = parser.parse_args()
+
+    if args.fake:
+        use_fake_services()
+    load_agencies(args.paths, prune=args.prune, dry_run=args.dry_run)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Offline replay harness for agency matcher engines
+
+Replays a labeled complaint corpus through each engine and reports routing
+quality (recall@1, recall@3, MRR), fallback rate and per-query latency.
+Agencies are loaded from local scraper dumps into an in-memory table, so
+the keyword engines need no network.
+
+Corpus format (JSONL), expected ids may use shell-style wildcards:
+    {"complaint": "Jalan rusak ...", "expected": ["*-pekerjaan-umum"]}
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from fnmatch import fnmatch
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# Offline runs don't need these; --pinecone requires the real values
+for _name in ('PINECONE_API_KEY', 'PINECONE_INDEX_NAME', 'CACHE_TABLE_NAME', 'FINDER_FUNCTION_NAME'):
+    os.environ.setdefault(_name, '')
+
+from agency_sync import keyword_rows
+from fake_services import FakeDynamoResource, FakeTable
+from load_agencies import load_dump
+
+from models import Ministry
+from services.dynamodb_matcher import DynamoDBMatcher
+from services.rank_fusion import agency_key, hybrid_contacts
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replay_corpus.jsonl')
+
+# Engine: complaint -> (ranked contacts, whether a fallback/secondary branch ran)
+Engine = Callable[[str], Tuple[List[Ministry], bool]]
+
+
+class TrigramIndex:
+    """Character-trigram cosine similarity over agency names and keywords (offline semantic stand-in)"""
+
+    def __init__(self, agencies: List[Dict]):
+        self.agencies = agencies
+        self.vectors = [self._vector(f"{a['name']} {' '.join(a.get('keywords') or [])}") for a in agencies]
+
+    @staticmethod
+    def _vector(text: str) -> Dict[str, float]:
+        padded = f"  {' '.join(text.lower().split())} "
+        counts = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+        norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+        return {gram: c / norm for gram, c in counts.items()}
+
+    def search(self, text: str, top_k: int = 3) -> List[Ministry]:
+        query = self._vector(text)
+        scored = [
+            (sum(weight * vector.get(gram, 0.0) for gram, weight in query.items()), agency)
+            for vector, agency in zip(self.vectors, self.agencies)
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [Ministry(name=a['name'], score=score, description='') for score, a in scored[:top_k]]
+
+
+def build_matcher(agencies: List[Dict]) -> DynamoDBMatcher:
+    rows = []
+    for agency in agencies:
+        rows.append(agency)
+        rows.extend(keyword_rows(agency))
+    return DynamoDBMatcher(dynamodb=FakeDynamoResource(FakeTable(rows)))
+
+
+def build_engines(agencies: List[Dict], use_pinecone: bool, use_memo: bool) -> Dict[str, Engine]:
+    matcher = build_matcher(agencies)
+    trigram = TrigramIndex(agencies)
+
+    def keyword(text: str) -> List[Ministry]:
+        if not use_memo:
+            matcher._memo.clear()
+        return matcher.match_agencies(text, top_k=3)
+
+    def with_fallback(secondary: Callable[[str], List[Ministry]]) -> Engine:
+        # Production behaviour before hybrid retrieval: secondary only on zero keyword results
+        def engine(text: str):
+            contacts = keyword(text)
+            return (contacts, False) if contacts else (secondary(text), True)
+        return engine
+
+    def hybrid(secondary: Callable[[str, int], List[Ministry]]) -> Engine:
+        # Runs the production hybrid path; the secondary retriever records whether it was used
+        def engine(text: str):
+            used = []
+
+            def semantic(query: str, top_k: int) -> List[Ministry]:
+                used.append(query)
+                return secondary(query, top_k)
+
+            return hybrid_contacts(text, keyword(text), semantic, top_k=3), bool(used)
+        return engine
+
+    engines: Dict[str, Engine] = {
+        'keyword': lambda text: (keyword(text), False),
+        'keyword+trigram': with_fallback(trigram.search),
+        'hybrid-trigram': hybrid(trigram.search),
+    }
+
+    if use_pinecone:
+        from services import BedrockService, PineconeService
+        bedrock_service, pinecone_service = BedrockService(), PineconeService()
+
+        def pinecone(text: str, top_k: int = 3) -> List[Ministry]:
+            embedding = bedrock_service.get_embedding(text)
+            return pinecone_service.find_relevant_ministries(embedding, top_k) if embedding else []
+
+        engines['keyword+pinecone'] = with_fallback(pinecone)
+        engines['hybrid-pinecone'] = hybrid(pinecone)
+    return engines
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def evaluate(engine: Engine, corpus: List[Dict], name_to_id: Dict[str, str], repeat: int = 1) -> Dict[str, float]:
+    hits_at_1 = hits_at_3 = fallbacks = 0
+    reciprocal_ranks = 0.0
+    latencies_us: List[float] = []
+
+    for case in corpus:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            contacts, used_fallback = engine(case['complaint'])
+            latencies_us.append((time.perf_counter() - start) * 1e6)
+
+        ids = [name_to_id.get(agency_key(c.name), c.name) for c in contacts]
+        ranks = [i for i, agency_id in enumerate(ids, 1)
+                 if any(fnmatch(agency_id, pattern) for pattern in case['expected'])]
+        first = ranks[0] if ranks else None
+        hits_at_1 += first == 1
+        hits_at_3 += first is not None and first <= 3
+        reciprocal_ranks += 1.0 / first if first else 0.0
+        fallbacks += used_fallback
+
+    latencies_us.sort()
+    n = len(corpus)
+    return {
+        'recall@1': hits_at_1 / n,
+        'recall@3': hits_at_3 / n,
+        'mrr': reciprocal_ranks / n,
+        'fallback_rate': fallbacks / n,
+        'mean_us': sum(latencies_us) / len(latencies_us),
+        'p50_us': percentile(latencies_us, 50),
+        'p95_us': percentile(latencies_us, 95),
+        'p99_us': percentile(latencies_us, 99),
+    }
+
+
+def print_report(results: Dict[str, Dict[str, float]], cases: int):
+    print(f"\n{'='*92}")
+    print(f"REPLAY: {cases} complaints")
+    print(f"{'='*92}")
+    print(f"{'engine':<18}{'R@1':>8}{'R@3':>8}{'MRR':>8}{'fallback':>10}"
+          f"{'mean µs':>10}{'p50 µs':>10}{'p95 µs':>10}{'p99 µs':>10}")
+    for name, m in results.items():
+        print(f"{name:<18}{m['recall@1']:>8.3f}{m['recall@3']:>8.3f}{m['mrr']:>8.3f}{m['fallback_rate']:>10.1%}"
+              f"{m['mean_us']:>10.0f}{m['p50_us']:>10.0f}{m['p95_us']:>10.0f}{m['p99_us']:>10.0f}")
+
+
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Quality metrics that dropped more than `tolerance` below the baseline"""
+    failures = []
+    for name, metrics in results.items():
+        for metric in ('recall@1', 'recall@3', 'mrr'):
+            expected: Optional[float] = baseline.get(name, {}).get(metric)
+            if expected is not None and metrics[metric] < expected - tolerance:
+                failures.append(f"{name} {metric}: {metrics[metric]:.3f} < baseline {expected:.3f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a labeled corpus through agency matcher engines")
+    parser.add_argument('dumps', nargs='*', default=['dki_agencies.json', 'national_ministries.json'],
+                        help='Agency dumps written by the scrapers (JSON or JSONL)')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='Labeled complaints (JSONL)')
+    parser.add_argument('--engines', help='Comma-separated engine names (default: all)')
+    parser.add_argument('--pinecone', action='store_true', help='Also run live Bedrock + Pinecone engines')
+    parser.add_argument('--memo', action='store_true', help='Keep the matcher memo warm between queries')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per complaint')
+    parser.add_argument('--save', help='Write results as JSON (e.g. a new baseline)')
+    parser.add_argument('--baseline', help='Fail if quality drops below this saved result')
+    parser.add_argument('--tolerance', type=float, default=0.0, help='Allowed drop vs baseline')
+    args = parser.parse_args()
+
+    agencies: Dict[str, Dict] = {}
+    for path in args.dumps:
+        if os.path.exists(path):
+            for agency in load_dump(path):
+                agencies[agency['agency_id']] = agency
+    if not agencies:
+        print("❌ Error: no agencies loaded; run the scrapers first or pass dump paths")
+        sys.exit(1)
+
+    with open(args.corpus) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    name_to_id = {agency_key(a['name']): a['agency_id'] for a in agencies.values()}
+
+    engines = build_engines(list(agencies.values()), args.pinecone, args.memo)
+    if args.engines:
+        engines = {name: engines[name] for name in args.engines.split(',')}
+
+    results = {name: evaluate(engine, corpus, name_to_id, args.repeat) for name, engine in engines.items()}
+    print_report(results, len(corpus))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📁 Saved to: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = regressions(results, json.load(f), args.tolerance)
+        if failures:
+            print("\n❌ Quality regression:")
+            for failure in failures:
+                print(f"   - {failure}")
+            sys.exit(1)
+        print("\n✅ No quality regression vs baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,58 @@
 """
 Scrape DKI Jakarta agencies with LLM verification
 """
+import argparse
 import json
 import os
+import threading
 import time
 from decimal import Decimal
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import boto3
 import requests
+from requests.adapters import HTTPAdapter
+
+from agency_sync import apply_diff, bump_data_version, diff_agencies, existing_rows
+from scrape_manifest import ScrapeManifest, fingerprint
+from scrape_pipeline import ScrapeJob, ScrapePipeline, TokenBucket, with_retry
 
 # Configuration
 SERPER_API_KEY = os.getenv('SERPER_API_KEY')
 AWS_REGION = os.getenv('AWS_REGION', 'ap-southeast-2')
 TABLE_NAME = os.getenv('AGENCIES_TABLE_NAME', 'agencies')
 
+# Endpoint overrides for running against local fakes (e.g. DynamoDB Local)
+SERPER_URL = os.getenv('SERPER_URL', 'https://google.serper.dev/search')
+BEDROCK_ENDPOINT_URL = os.getenv('BEDROCK_ENDPOINT_URL')
+DYNAMODB_ENDPOINT_URL = os.getenv('DYNAMODB_ENDPOINT_URL')
+
+# Pipeline tuning
+SERPER_QPS = float(os.getenv('SERPER_QPS', '5'))
+BEDROCK_RPS = float(os.getenv('BEDROCK_RPS', '2'))
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', '8'))
+VERIFY_WORKERS = int(os.getenv('VERIFY_WORKERS', '4'))
+VERIFY_BATCH_SIZE = int(os.getenv('VERIFY_BATCH_SIZE', '5'))
+
+# Verification
+VERIFY_MODEL_ID = os.getenv('VERIFY_MODEL_ID', 'anthropic.claude-3-haiku-20240307-v1:0')
+VERIFY_TOKENS_PER_AGENCY = 200
+MAX_RESULTS_PER_AGENCY = 10
+
+# Incremental re-scrape
+MANIFEST_PATH = os.getenv('SCRAPE_MANIFEST', 'scrape_manifest.jsonl')
+MAX_AGE_HOURS = float(os.getenv('SCRAPE_MAX_AGE_HOURS', '168'))
+
+# Shared across all pipeline workers
+serper_limiter = TokenBucket(SERPER_QPS)
+bedrock_limiter = TokenBucket(BEDROCK_RPS)
+
+_clients: Dict[str, object] = {}
+_clients_lock = threading.Lock()
+
+
+class RetryableSearchError(Exception):
+    """Serper returned a status worth retrying (429 or 5xx)."""
+
 # DKI Jakarta agencies
 DKI_PROVINCIAL_DINAS = [
     "Dinas Kesehatan",
@@ -62,9 +101,45 @@ KEYWORDS_MAP = {
 }
 
 
+def _client(name: str, factory):
+    """Returns a lazily created client shared by all worker threads."""
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_http_session():
+    def factory():
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_maxsize=SEARCH_WORKERS))
+        return session
+    return _client('serper', factory)
+
+
+def get_bedrock_client():
+    return _client('bedrock', lambda: boto3.client(
+        'bedrock-runtime', region_name=AWS_REGION, endpoint_url=BEDROCK_ENDPOINT_URL
+    ))
+
+
+def get_table():
+    return _client('table', lambda: boto3.resource(
+        'dynamodb', region_name=AWS_REGION, endpoint_url=DYNAMODB_ENDPOINT_URL
+    ).Table(TABLE_NAME))
+
+
+def use_fake_services():
+    """Swaps in local fakes for Serper, Bedrock and DynamoDB."""
+    from fake_services import FakeBedrockClient, FakeSerperSession, FakeTable
+    with _clients_lock:
+        _clients['serper'] = FakeSerperSession()
+        _clients['bedrock'] = FakeBedrockClient()
+        _clients['table'] = FakeTable(table_name=TABLE_NAME)
+
+
 def search_agency(agency_name: str, location: str = "DKI Jakarta") -> Dict:
     """Search for agency information using Serper API"""
-    url = "https://google.serper.dev/search"
     headers = {"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"}
     
     queries = [
@@ -76,24 +151,47 @@ def search_agency(agency_name: str, location: str = "DKI Jakarta") -> Dict:
     results = {}
     for query in queries:
         payload = {"q": query, "num": 5}
-        response = requests.post(url, json=payload, headers=headers)
+        serper_limiter.acquire()
+        response = get_http_session().post(SERPER_URL, json=payload, headers=headers, timeout=10)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableSearchError(f"Serper returned {response.status_code} for '{query}'")
         if response.status_code == 200:
             results[query] = response.json()
-        time.sleep(0.5)  # Rate limiting
     
     return results
 
 
-def verify_with_llm(agency_name: str, location: str, search_results: Dict) -> Dict:
-    """Use Bedrock to verify official accounts"""
-    bedrock = boto3.client('bedrock-runtime', region_name=AWS_REGION)
-    
-    prompt = f"""Analyze these search results for {agency_name} {location}.
+def compact_search_results(search_results: Dict) -> List[Dict]:
+    """Keep only the organic result fields that matter for verification, deduplicated by link"""
+    compact = []
+    seen_links = set()
+    for query in sorted(search_results):
+        for result in search_results[query].get('organic', []):
+            link = result.get('link')
+            if link in seen_links:
+                continue
+            seen_links.add(link)
+            compact.append({
+                'title': result.get('title'),
+                'link': link,
+                'snippet': result.get('snippet')
+            })
+    return compact
+
+
+def format_search_results(search_results: Dict) -> str:
+    """Render compacted results as short plain-text lines for the prompt"""
+    return "\n".join(
+        f"- {r['title']} | {r['link']}\n  {r['snippet'] or ''}"
+        for r in compact_search_results(search_results)[:MAX_RESULTS_PER_AGENCY]
+    )
+
 
-Search Results:
-{json.dumps(search_results, indent=2)}
+VERIFY_BATCH_PROMPT = """Analyze these search results for {count} Indonesian government agencies.
 
-Task: Extract ONLY official government accounts and contact info.
+{agencies}
+
+Task: For EACH agency, extract ONLY its official government accounts and contact info.
 
 Rules:
 - Twitter: Must have @handle format, prefer verified or high followers
@@ -101,24 +199,46 @@ Rules:
 - Website: Must be .go.id domain or official government site
 - Phone: Must be valid Indonesian number
 - Reject parody, fan, or unofficial accounts
+- Never use results listed under one agency for another agency
 
-Return JSON:
+Return ONLY a JSON object keyed by agency id, one entry per agency:
 {{
-  "twitter": "@handle or null",
-  "instagram": "@handle or null", 
-  "facebook": "page_name or null",
-  "website": "url or null",
-  "phone": "number or null",
-  "email": "email or null",
-  "confidence": 0.0-1.0,
-  "reasoning": "brief explanation"
+  "1": {{
+    "twitter": "@handle or null",
+    "instagram": "@handle or null",
+    "facebook": "page_name or null",
+    "website": "url or null",
+    "phone": "number or null",
+    "email": "email or null",
+    "confidence": 0.0-1.0,
+    "reasoning": "brief explanation"
+  }}
 }}"""
 
-    response = bedrock.invoke_model(
-        modelId='anthropic.claude-3-haiku-20240307-v1:0',
+
+def verify_batch_with_llm(agencies: List[Tuple[str, str, Dict]]) -> List[Optional[Dict]]:
+    """
+    Verify several agencies with one Bedrock call.
+    
+    Args:
+        agencies: (agency_name, location, search_results) tuples
+        
+    Returns:
+        Verified contact info per agency, in input order (None if missing from
+        the response, or for every agency when a multi-agency response can't be parsed)
+    """
+    sections = "\n\n".join(
+        f'<agency id="{i}" name="{name} {location}">\n{format_search_results(results)}\n</agency>'
+        for i, (name, location, results) in enumerate(agencies, 1)
+    )
+    prompt = VERIFY_BATCH_PROMPT.format(count=len(agencies), agencies=sections)
+    
+    bedrock_limiter.acquire()
+    response = get_bedrock_client().invoke_model(
+        modelId=VERIFY_MODEL_ID,
         body=json.dumps({
             "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 500,
+            "max_tokens": VERIFY_TOKENS_PER_AGENCY * len(agencies),
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.1
         })
@@ -130,7 +250,29 @@ Return JSON:
     # Extract JSON from response
     start = content.find('{')
     end = content.rfind('}') + 1
-    return json.loads(content[start:end])
+    try:
+        verified = json.loads(content[start:end])
+        if not isinstance(verified, dict):
+            raise json.JSONDecodeError("Expected a JSON object", content, max(start, 0))
+    except json.JSONDecodeError:
+        if len(agencies) == 1:
+            raise
+        # Malformed or cut off at max_tokens: re-sending the same batch won't help,
+        # so every agency is re-verified on its own
+        print(f"⚠️  Unparseable verification for {len(agencies)} agencies, verifying individually")
+        return [None] * len(agencies)
+    return [
+        entry if isinstance(entry, dict) else None
+        for entry in (verified.get(str(i)) for i in range(1, len(agencies) + 1))
+    ]
+
+
+def verify_with_llm(agency_name: str, location: str, search_results: Dict) -> Dict:
+    """Use Bedrock to verify official accounts"""
+    verified = verify_batch_with_llm([(agency_name, location, search_results)])[0]
+    if verified is None:
+        raise ValueError(f"No verification returned for {agency_name} {location}")
+    return verified
 
 
 def generate_agency_id(name: str, location: str) -> str:
@@ -148,43 +290,40 @@ def extract_keywords(agency_name: str) -> List[str]:
     return []
 
 
-def store_agency(agency_data: Dict):
-    """Store agency in DynamoDB"""
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    table = dynamodb.Table(TABLE_NAME)
+def store_agency(agency_data: Dict) -> Tuple[Dict, bool]:
+    """
+    Store agency in DynamoDB, writing only rows that changed.
+    Returns the record as stored, which keeps the table's created_at, and
+    whether anything was written. The caller bumps the data version once
+    after all agencies are stored.
+    """
+    table = get_table()
     
-    # Store main record
-    table.put_item(Item=agency_data)
+    # Diff against the stored record and its keyword index entries
+    current = existing_rows(table, agency_data['agency_id'])
+    diff = diff_agencies([agency_data], current)
+    apply_diff(table, diff)
     
-    # Store keyword index entries
-    for keyword in agency_data['keywords']:
-        table.put_item(Item={
-            'agency_id': f"keyword#{keyword}#{agency_data['agency_id']}",
-            'keyword': keyword,
-            'agency_ref': agency_data['agency_id']
-        })
-    
-    print(f"✅ Stored: {agency_data['name']}")
+    print(f"✅ Stored: {agency_data['name']} ({diff.summary()})")
+    stored = dict(agency_data)
+    if current and current[0].get('created_at'):
+        stored['created_at'] = current[0]['created_at']
+    return stored, not diff.empty
 
 
-def scrape_agency(name: str, location: str, level: str) -> Dict:
-    """Scrape single agency"""
-    print(f"\n🔍 Scraping: {name} - {location}")
-    
-    # Search
-    search_results = search_agency(name, location)
-    
-    # Verify with LLM
-    verified = verify_with_llm(name, location, search_results)
-    
-    # Build agency data
-    agency_data = {
-        'agency_id': generate_agency_id(name, location),
-        'name': f"{name} {location}",
+def now_iso() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def build_agency_data(job: ScrapeJob, verified: Dict, created_at: Optional[str] = None) -> Dict:
+    """Build the DynamoDB record for a verified agency"""
+    return {
+        'agency_id': job_agency_id(job),
+        'name': f"{job.name} {job.location}",
         'province': 'DKI Jakarta',
-        'city': location if level == 'city' else None,
-        'level': level,
-        'keywords': extract_keywords(name),
+        'city': job.location if job.level == 'city' else None,
+        'level': job.level,
+        'keywords': job.keywords if job.keywords is not None else extract_keywords(job.name),
         'social_media': {
             'twitter': verified.get('twitter'),
             'instagram': verified.get('instagram'),
@@ -195,50 +334,151 @@ def scrape_agency(name: str, location: str, level: str) -> Dict:
         'email': verified.get('email'),
         'confidence': Decimal(str(verified.get('confidence', 0.0))),
         'reasoning': verified.get('reasoning', ''),
-        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ')
+        'created_at': created_at or now_iso(),
+        'updated_at': now_iso()
     }
-    
-    return agency_data
 
 
-def scrape_dki_jakarta():
-    """Scrape all DKI Jakarta agencies"""
-    agencies = []
+def job_agency_id(job: ScrapeJob) -> str:
+    return job.agency_id or generate_agency_id(job.name, job.location)
+
+
+def scrape_agency(name: str, location: str, level: str) -> Dict:
+    """Scrape single agency"""
+    print(f"\n🔍 Scraping: {name} - {location}")
+    job = ScrapeJob(name, location, level)
+    search_results = search_agency(name, location)
+    verified = verify_with_llm(name, location, search_results)
+    return build_agency_data(job, verified)
+
+
+def run_pipeline(jobs: List[ScrapeJob], search_workers: int = SEARCH_WORKERS,
+                 verify_workers: int = VERIFY_WORKERS, manifest: Optional[ScrapeManifest] = None,
+                 max_age_hours: float = MAX_AGE_HOURS, verify_batch_size: int = VERIFY_BATCH_SIZE) -> List[Dict]:
+    """
+    Run jobs through the concurrent search -> verify -> store pipeline.
     
-    # Provincial level
-    print("\n" + "="*50)
-    print("SCRAPING PROVINCIAL DINAS")
-    print("="*50)
+    With a manifest, agencies checked within `max_age_hours` are skipped,
+    verification is reused when the search results hash is unchanged, and
+    each stored agency is checkpointed so an interrupted run resumes.
+    Agencies that need verification are packed `verify_batch_size` per prompt.
+    """
+    agencies: List[Dict] = []
+    pending = []
+    for job in jobs:
+        entry = manifest.get(job_agency_id(job)) if manifest is not None else None
+        if entry and manifest.is_fresh(entry['agency_id'], max_age_hours * 3600):
+            agencies.append(build_agency_data(job, entry['verified'], entry['created_at']))
+        else:
+            pending.append(job)
+    if manifest is not None:
+        print(f"📒 {len(jobs) - len(pending)} fresh in manifest, {len(pending)} to refresh")
+    
+    # agency_id -> (search_hash, verified, reverified), consumed by the store stage
+    checkpoints: Dict[str, tuple] = {}
+    reverified: List[str] = []
+    changed: List[str] = []
     
-    for dinas in DKI_PROVINCIAL_DINAS:
-        try:
-            agency = scrape_agency(dinas, "DKI Jakarta", "provincial")
-            agencies.append(agency)
-            store_agency(agency)
-            time.sleep(1)  # Rate limiting
-        except Exception as e:
-            print(f"❌ Error: {dinas} - {e}")
+    def search(job: ScrapeJob) -> Dict:
+        print(f"🔍 Searching: {job.name} - {job.location}")
+        return search_agency(job.name, job.location)
+    
+    def verify(batch: List[Tuple[ScrapeJob, Dict]]) -> List:
+        # Reuse stored verification when the search results are unchanged
+        results: List = [None] * len(batch)
+        to_verify = []
+        for i, (job, search_results) in enumerate(batch):
+            agency_id = job_agency_id(job)
+            search_hash = fingerprint(compact_search_results(search_results))
+            entry = manifest.get(agency_id) if manifest is not None else None
+            created_at = entry['created_at'] if entry else None
+            if entry and entry['search_hash'] == search_hash:
+                checkpoints[agency_id] = (search_hash, entry['verified'], False)
+                results[i] = build_agency_data(job, entry['verified'], created_at)
+            else:
+                to_verify.append((i, job, search_results, search_hash, created_at))
+        
+        if to_verify:
+            verified_batch = verify_batch_with_llm([(job.name, job.location, r) for _, job, r, _, _ in to_verify])
+            for (i, job, search_results, search_hash, created_at), verified in zip(to_verify, verified_batch):
+                try:
+                    if verified is None:
+                        # Missing from the batch response (or it was unparseable), retry on its own
+                        verified = with_retry(verify_with_llm, job.name, job.location, search_results)
+                except Exception as e:
+                    results[i] = e
+                    continue
+                checkpoints[job_agency_id(job)] = (search_hash, verified, True)
+                reverified.append(job_agency_id(job))
+                results[i] = build_agency_data(job, verified, created_at)
+        return results
+    
+    def store(agency: Dict):
+        # Without a manifest entry created_at defaults to now; the table knows the real one,
+        # and the manifest and JSON dump (this same dict) must agree with it
+        stored, was_changed = store_agency(agency)
+        agency['created_at'] = stored['created_at']
+        if was_changed:
+            changed.append(agency['agency_id'])
+        if manifest is not None:
+            # Pop only once recorded: store() is retried, and a retry must still find the checkpoint
+            search_hash, verified, was_reverified = checkpoints[agency['agency_id']]
+            manifest.record(agency['agency_id'], search_hash, verified, agency['created_at'], was_reverified)
+            checkpoints.pop(agency['agency_id'], None)
+    
+    pipeline = ScrapePipeline(
+        search, verify, store,
+        search_workers=search_workers,
+        verify_workers=verify_workers,
+        verify_batch_size=verify_batch_size
+    )
+    started = time.monotonic()
+    try:
+        stored, failed = pipeline.run(pending)
+    finally:
+        # One bump per run, like load_agencies.py, so matcher memos are cleared once
+        if changed:
+            print(f"🔖 {len(changed)} agencies changed, data version {bump_data_version(get_table())}")
+    print(
+        f"\n⏱️  {len(stored)} stored ({len(reverified)} re-verified), "
+        f"{len(failed)} failed in {time.monotonic() - started:.1f}s"
+    )
+    return agencies + stored
+
+
+def save_json(agencies: List[Dict], path: str):
+    """Save scraped agencies to a JSON file"""
+    def default(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+    
+    with open(path, 'w') as f:
+        json.dump(sorted(agencies, key=lambda a: a['agency_id']), f, indent=2, default=default)
+
+
+def dki_jobs() -> List[ScrapeJob]:
+    """Provincial dinas followed by every municipal dinas"""
+    jobs = [ScrapeJob(dinas, "DKI Jakarta", "provincial") for dinas in DKI_PROVINCIAL_DINAS]
+    for city in DKI_CITIES:
+        jobs.extend(ScrapeJob(dinas, city, "city") for dinas in DKI_PROVINCIAL_DINAS)
+    return jobs
+
+
+def scrape_dki_jakarta(search_workers: int = SEARCH_WORKERS, verify_workers: int = VERIFY_WORKERS,
+                       manifest: Optional[ScrapeManifest] = None, max_age_hours: float = MAX_AGE_HOURS,
+                       verify_batch_size: int = VERIFY_BATCH_SIZE):
+    """Scrape all DKI Jakarta agencies"""
+    jobs = dki_jobs()
     
-    # Municipal level
     print("\n" + "="*50)
-    print("SCRAPING MUNICIPAL DINAS")
+    print(f"SCRAPING {len(jobs)} DKI JAKARTA DINAS")
     print("="*50)
     
-    for city in DKI_CITIES:
-        print(f"\n📍 {city}")
-        for dinas in DKI_PROVINCIAL_DINAS:
-            try:
-                agency = scrape_agency(dinas, city, "city")
-                agencies.append(agency)
-                store_agency(agency)
-                time.sleep(1)
-            except Exception as e:
-                print(f"❌ Error: {dinas} {city} - {e}")
+    agencies = run_pipeline(jobs, search_workers, verify_workers, manifest, max_age_hours, verify_batch_size)
     
     # Save to file
-    with open('dki_agencies.json', 'w') as f:
-        json.dump(agencies, f, indent=2)
+    save_json(agencies, 'dki_agencies.json')
     
     print(f"\n✅ Scraped {len(agencies)} agencies")
     print(f"📁 Saved to: dki_agencies.json")
@@ -246,10 +486,33 @@ def scrape_dki_jakarta():
     return agencies
 
 
+def parse_args(description: str) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--fake', action='store_true', help='Use local fakes for Serper, Bedrock and DynamoDB')
+    parser.add_argument('--search-workers', type=int, default=SEARCH_WORKERS)
+    parser.add_argument('--verify-workers', type=int, default=VERIFY_WORKERS)
+    parser.add_argument('--verify-batch-size', type=int, default=VERIFY_BATCH_SIZE,
+                        help='Agencies verified per Bedrock prompt')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Checkpoint manifest path')
+    parser.add_argument('--no-manifest', action='store_true', help='Scrape everything from scratch')
+    parser.add_argument('--max-age-hours', type=float, default=MAX_AGE_HOURS,
+                        help='Skip agencies checked more recently than this (0 re-searches everything)')
+    return parser.parse_args()
+
+
+def open_manifest(args: argparse.Namespace) -> Optional[ScrapeManifest]:
+    return None if args.no_manifest else ScrapeManifest(args.manifest)
+
+
 if __name__ == '__main__':
-    if not SERPER_API_KEY:
+    args = parse_args("Scrape DKI Jakarta agencies")
+    if args.fake:
+        use_fake_services()
+    elif not SERPER_API_KEY:
         print("❌ Error: SERPER_API_KEY not set")
         print("Get free API key: https://serper.dev")
         exit(1)
     
-    scrape_dki_jakarta()
+    scrape_dki_jakarta(
+        args.search_workers, args.verify_workers, open_manifest(args), args.max_age_hours, args.verify_batch_size
+    )
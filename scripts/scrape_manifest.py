@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Local checkpoint manifest for incremental scraping
+
+One JSON line is appended per processed agency, so an interrupted run can
+resume from the last stored agency. Each entry keeps a hash of the search
+results and the verification output so unchanged agencies skip Bedrock.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+
+def fingerprint(data: Any) -> str:
+    """Stable SHA-256 of JSON-serializable data"""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+class ScrapeManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partially written last line from an interrupted run
+                    continue
+                self._entries[entry['agency_id']] = entry
+        if lines > 2 * len(self._entries):
+            self._compact()
+
+    def _compact(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, default=_json_default) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, agency_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._entries.get(agency_id)
+
+    def is_fresh(self, agency_id: str, max_age_seconds: float, now: Optional[float] = None) -> bool:
+        """True if the agency was checked within `max_age_seconds`"""
+        entry = self.get(agency_id)
+        if entry is None or max_age_seconds <= 0:
+            return False
+        return (now or time.time()) - entry['checked_at'] < max_age_seconds
+
+    def record(self, agency_id: str, search_hash: str, verified: Dict, created_at: str, reverified: bool):
+        """Checkpoints a stored agency"""
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(agency_id, {})
+            entry = {
+                'agency_id': agency_id,
+                'search_hash': search_hash,
+                'verified': verified,
+                'verified_hash': fingerprint(verified),
+                'created_at': created_at,
+                'checked_at': now,
+                'verified_at': now if reverified else previous.get('verified_at', now)
+            }
+            self._entries[agency_id] = entry
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry, default=_json_default) + "\n")
+                f.flush()
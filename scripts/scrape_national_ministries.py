@@ -1,13 +1,7 @@
 #!/usr/bin/env python3
 """Scrape 34 national ministries"""
-import os
-import time
-
-# Ensure SERPER_API_KEY is set
-if not os.getenv('SERPER_API_KEY'):
-    raise ValueError("SERPER_API_KEY environment variable must be set")
-
-from scrape_dki_agencies import scrape_agency, store_agency
+from scrape_dki_agencies import SERPER_API_KEY, open_manifest, parse_args, run_pipeline, save_json, use_fake_services
+from scrape_pipeline import ScrapeJob
 
 NATIONAL_MINISTRIES = [
     ("Kementerian Dalam Negeri", ["ktp", "kk", "akta", "dukcapil", "pemda", "daerah"]),
@@ -46,36 +40,43 @@ NATIONAL_MINISTRIES = [
     ("Badan Pertanahan Nasional", ["tanah", "sertifikat", "bpn", "pertanahan"]),
 ]
 
-print(f"\n{'='*60}")
-print(f"SCRAPING {len(NATIONAL_MINISTRIES)} NATIONAL MINISTRIES")
-print(f"{'='*60}\n")
 
-scraped = 0
-failed = []
+def ministry_agency_id(ministry_name: str) -> str:
+    return ministry_name.lower().replace(" ", "-").replace("kementerian-", "kemenkementerian-")
+
+
+def national_jobs():
+    return [
+        ScrapeJob(ministry_name, "Indonesia", "national", keywords=keywords, agency_id=ministry_agency_id(ministry_name))
+        for ministry_name, keywords in NATIONAL_MINISTRIES
+    ]
 
-for i, (ministry_name, keywords) in enumerate(NATIONAL_MINISTRIES, 1):
-    try:
-        print(f"[{i}/{len(NATIONAL_MINISTRIES)}] {ministry_name}...", end=" ", flush=True)
-        
-        # Use existing scraper but override keywords
-        agency = scrape_agency(ministry_name, "Indonesia", "national")
-        agency['keywords'] = keywords  # Override with our keywords
-        agency['agency_id'] = ministry_name.lower().replace(" ", "-").replace("kementerian-", "kemenkementerian-")
-        
-        store_agency(agency)
-        scraped += 1
-        print("✅")
-        
-        time.sleep(1)  # Rate limiting
-        
-    except Exception as e:
-        print(f"❌ {e}")
-        failed.append(ministry_name)
 
-print(f"\n{'='*60}")
-print(f"✅ Scraped: {scraped}/{len(NATIONAL_MINISTRIES)}")
-if failed:
-    print(f"❌ Failed: {len(failed)}")
-    for f in failed:
-        print(f"   - {f}")
-print(f"{'='*60}\n")
+if __name__ == '__main__':
+    args = parse_args("Scrape national ministries")
+    if args.fake:
+        use_fake_services()
+    elif not SERPER_API_KEY:
+        raise ValueError("SERPER_API_KEY environment variable must be set")
+    
+    print(f"\n{'='*60}")
+    print(f"SCRAPING {len(NATIONAL_MINISTRIES)} NATIONAL MINISTRIES")
+    print(f"{'='*60}\n")
+    
+    agencies = run_pipeline(
+        national_jobs(), args.search_workers, args.verify_workers, open_manifest(args), args.max_age_hours,
+        args.verify_batch_size
+    )
+    save_json(agencies, 'national_ministries.json')
+    
+    scraped_ids = {a['agency_id'] for a in agencies}
+    failed = [name for name, _ in NATIONAL_MINISTRIES if ministry_agency_id(name) not in scraped_ids]
+    
+    print(f"\n{'='*60}")
+    print(f"✅ Scraped: {len(agencies)}/{len(NATIONAL_MINISTRIES)}")
+    if failed:
+        print(f"❌ Failed: {len(failed)}")
+        for f in failed:
+            print(f"   - {f}")
+    print(f"📁 Saved to: national_ministries.json")
+    print(f"{'='*60}\n")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Concurrent scraping pipeline: search -> verify -> store
+
+Search jobs run in a worker pool behind shared token-bucket rate limiters,
+verification runs in batches on a smaller bounded pool, and a single storage
+thread writes results as they arrive. Every stage retries with exponential
+backoff.
+"""
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Type, Union
+
+
+class TokenBucket:
+    """Thread-safe token bucket; `acquire` blocks until a token is available."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def with_retry(
+    fn: Callable,
+    *args,
+    attempts: int = 4,
+    base_delay: float = 0.5,
+    max_delay: float = 8.0,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    **kwargs
+):
+    """Calls fn, retrying with exponential backoff and full jitter."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except retry_on:
+            if attempt == attempts:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1))))
+
+
+@dataclass
+class ScrapeJob:
+    name: str
+    location: str
+    level: str
+    keywords: Optional[List[str]] = None  # Overrides keyword extraction
+    agency_id: Optional[str] = None  # Overrides generated ID
+
+
+_DONE = object()
+
+
+class ScrapePipeline:
+    """
+    Runs jobs through three stages:
+      search_fn(job) -> search_results
+      verify_fn([(job, search_results), ...]) -> [agency_data or Exception, ...]
+      store_fn(agency_data)
+
+    Searched jobs are grouped into batches of `verify_batch_size`; a partial
+    batch is flushed once no search has completed for `verify_flush_seconds`.
+    """
+
+    def __init__(
+        self,
+        search_fn: Callable[[ScrapeJob], Dict],
+        verify_fn: Callable[[List[Tuple[ScrapeJob, Dict]]], List[Union[Dict, Exception]]],
+        store_fn: Callable[[Dict], None],
+        search_workers: int = 8,
+        verify_workers: int = 4,
+        verify_batch_size: int = 1,
+        verify_flush_seconds: float = 2.0,
+        attempts: int = 4
+    ):
+        self.search_fn = search_fn
+        self.verify_fn = verify_fn
+        self.store_fn = store_fn
+        self.search_workers = search_workers
+        self.verify_workers = verify_workers
+        self.verify_batch_size = max(1, verify_batch_size)
+        self.verify_flush_seconds = verify_flush_seconds
+        self.attempts = attempts
+        self._lock = threading.Lock()
+
+    def run(self, jobs: List[ScrapeJob]) -> Tuple[List[Dict], List[Tuple[ScrapeJob, Exception]]]:
+        """Processes all jobs; returns stored agencies and failed jobs."""
+        stored: List[Dict] = []
+        failed: List[Tuple[ScrapeJob, Exception]] = []
+        store_queue: "queue.Queue" = queue.Queue()
+
+        def fail(job: ScrapeJob, error: Exception):
+            print(f"❌ Error: {job.name} {job.location} - {error}")
+            with self._lock:
+                failed.append((job, error))
+
+        def store_worker():
+            while True:
+                item = store_queue.get()
+                if item is _DONE:
+                    return
+                job, agency = item
+                try:
+                    with_retry(self.store_fn, agency, attempts=self.attempts)
+                    stored.append(agency)
+                except Exception as e:
+                    fail(job, e)
+
+        store_thread = threading.Thread(target=store_worker, name="scrape-store", daemon=True)
+        store_thread.start()
+
+        def on_verified(batch: List[Tuple[ScrapeJob, Dict]], future):
+            try:
+                results = future.result()
+            except Exception as e:
+                for job, _ in batch:
+                    fail(job, e)
+                return
+            for (job, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    fail(job, result)
+                else:
+                    store_queue.put((job, result))
+
+        with ThreadPoolExecutor(self.search_workers, thread_name_prefix="scrape-search") as search_pool, \
+                ThreadPoolExecutor(self.verify_workers, thread_name_prefix="scrape-verify") as verify_pool:
+
+            def submit_verify(batch: List[Tuple[ScrapeJob, Dict]]):
+                future = verify_pool.submit(with_retry, self.verify_fn, batch, attempts=self.attempts)
+                future.add_done_callback(lambda f: on_verified(batch, f))
+
+            search_futures = {
+                search_pool.submit(with_retry, self.search_fn, job, attempts=self.attempts): job
+                for job in jobs
+            }
+            pending = set(search_futures)
+            buffer: List[Tuple[ScrapeJob, Dict]] = []
+            while pending:
+                done, pending = wait(pending, timeout=self.verify_flush_seconds, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = search_futures[future]
+                    try:
+                        buffer.append((job, future.result()))
+                    except Exception as e:
+                        fail(job, e)
+                while len(buffer) >= self.verify_batch_size:
+                    submit_verify(buffer[:self.verify_batch_size])
+                    buffer = buffer[self.verify_batch_size:]
+                if buffer and (not done or not pending):
+                    submit_verify(buffer)
+                    buffer = []
+
+        store_queue.put(_DONE)
+        store_thread.join()
+        return stored, failed
@@ -1,4 +1,8 @@
-COMPLAINT_GENERATION_PROMPT_FORMAL = """Human: Kamu adalah warga Indonesia yang mau komen di Instagram akun pejabat pemerintah tentang keluhan ini: '{user_prompt}'
+# Generation prompts are split into a static system prompt (instructions and
+# example, identical for every request of a tone) and the user content, so
+# the prefix can be served from Bedrock's prompt cache.
+
+COMPLAINT_SYSTEM_PROMPT_FORMAL = """Kamu adalah warga Indonesia yang mau komen di Instagram akun pejabat pemerintah tentang sebuah keluhan.
 
 Tulis komentar yang:
 - Formal dan sopan
@@ -10,11 +14,9 @@ Tulis komentar yang:
 
 Contoh style: "Mohon perhatiannya untuk jalan di Jl. Sudirman yang kondisinya rusak parah. Sudah dilaporkan ke RT namun belum ada tindak lanjut. Terima kasih atas perhatiannya 🙏"
 
-Tulis komentar Instagram-nya:
-
-A:"""
+Tulis hanya komentar Instagram-nya."""
 
-COMPLAINT_GENERATION_PROMPT_FUNNY = """Human: Kamu adalah warga Indonesia yang mau komen di Instagram akun pejabat pemerintah tentang keluhan ini: '{user_prompt}'
+COMPLAINT_SYSTEM_PROMPT_FUNNY = """Kamu adalah warga Indonesia yang mau komen di Instagram akun pejabat pemerintah tentang sebuah keluhan.
 
 Tulis komentar yang:
 - Lucu dan menghibur tapi tetap sopan
@@ -26,11 +28,9 @@ Tulis komentar yang:
 
 Contoh style: "Min, jalan depan rumah gue kayak medan perang nih 😅 Udah 3 bulan nunggu diperbaiki, apa lagi nunggu jadi danau dulu? Tolong dibantu dong Min, kasian motor gue 🙏"
 
-Tulis komentar Instagram-nya:
+Tulis hanya komentar Instagram-nya."""
 
-A:"""
-
-COMPLAINT_GENERATION_PROMPT_ANGRY = """Human: Kamu adalah warga Indonesia yang mau komen di Instagram akun pejabat pemerintah tentang keluhan ini: '{user_prompt}'
+COMPLAINT_SYSTEM_PROMPT_ANGRY = """Kamu adalah warga Indonesia yang mau komen di Instagram akun pejabat pemerintah tentang sebuah keluhan.
 
 Tulis komentar yang:
 - Tegas dan menunjukkan kekesalan
@@ -42,28 +42,45 @@ Tulis komentar yang:
 
 Contoh style: "Serius nih Min, jalan depan rumah gue udah kayak kubangan kerbau! Udah 3 bulan lapor tapi cuma dijawab 'ditindaklanjuti'. Kapan sih kerja beneran? Pajak gue bayar buat apa? 😤"
 
-Tulis komentar Instagram-nya:
+Tulis hanya komentar Instagram-nya."""
+
+COMPLAINT_SYSTEM_PROMPTS = {
+    "formal": COMPLAINT_SYSTEM_PROMPT_FORMAL,
+    "funny": COMPLAINT_SYSTEM_PROMPT_FUNNY,
+    "angry": COMPLAINT_SYSTEM_PROMPT_ANGRY,
+}
 
-A:"""
+COMPLAINT_USER_PROMPT = """Keluhan: '{user_prompt}'
+
+Tulis komentar Instagram-nya:"""
+
+RATIONALE_SYSTEM_PROMPT = """You will be given a user's complaint and the top-matched government ministry and its function.
+
+Your task is to write a brief, clear rationale (in 1-2 sentences) explaining *why* this ministry is the correct one to handle this specific complaint.
+Directly connect key phrases from the complaint to the ministry's function.
+Example: "Kementerian PUPR disarankan karena keluhan Anda tentang 'jalan rusak' dan 'jembatan' terkait langsung dengan tanggung jawab mereka atas 'infrastruktur jalan' dan 'jembatan'."
 
-# Keep the original as default
-COMPLAINT_GENERATION_PROMPT = COMPLAINT_GENERATION_PROMPT_FORMAL
+Write only the rationale."""
 
-RATIONALE_GENERATION_PROMPT = """Human: Here is a user's complaint:
-<complaint>
+RATIONALE_USER_PROMPT = """<complaint>
 {user_prompt}
 </complaint>
 
-And here is the top-matched government ministry and its function:
 <ministry>
 Nama: {ministry_name}
 Fungsi: {ministry_desc}
-</ministry>
+</ministry>"""
 
-Your task is to write a brief, clear rationale (in 1-2 sentences) explaining *why* this ministry is the correct one to handle this specific complaint.
-Directly connect key phrases from the complaint to the ministry's function.
-Example: "Kementerian PUPR disarankan karena keluhan Anda tentang 'jalan rusak' dan 'jembatan' terkait langsung dengan tanggung jawab mereka atas 'infrastruktur jalan' dan 'jembatan'."
+# Local templates used when Bedrock is unavailable (circuit open or call failed)
+FALLBACK_COMPLAINT_TEMPLATE_FORMAL = "Mohon perhatiannya{agency_mention} terkait keluhan berikut: {complaint}. Mohon dapat segera ditindaklanjuti. Terima kasih atas perhatiannya 🙏"
+
+FALLBACK_COMPLAINT_TEMPLATE_FUNNY = "Min{agency_mention}, izin curhat dikit ya 😅 {complaint}. Tolong dibantu dong Min, biar warga bisa senyum lagi 🙏"
+
+FALLBACK_COMPLAINT_TEMPLATE_ANGRY = "Serius nih{agency_mention}! {complaint}. Mau nunggu sampai kapan lagi? Tolong segera ditindak! 😤"
+
+FALLBACK_RATIONALE_TEMPLATE = "{ministry_name} disarankan karena keluhan Anda tentang {keywords} terkait langsung dengan tanggung jawab mereka."
 
-Write only the rationale.
+FALLBACK_RATIONALE_TEMPLATE_GENERIC = "{ministry_name} disarankan karena instansi ini paling sesuai dengan isi keluhan Anda."
 
-A:"""
+# Used instead of RATIONALE_SYSTEM_PROMPT for high-confidence keyword matches
+TEMPLATED_RATIONALE_TEMPLATE = "{ministry_name} disarankan karena keluhan Anda tentang {keywords} terkait langsung dengan tanggung jawab mereka atas {functions}."
@@ -10,12 +10,85 @@ PINECONE_INDEX_NAME = os.environ["PINECONE_INDEX_NAME"]
 # DynamoDB Configuration
 CACHE_TABLE_NAME = os.environ["CACHE_TABLE_NAME"]
 
-# Lambda Configuration
-FINDER_FUNCTION_NAME = os.environ["FINDER_FUNCTION_NAME"]
+# Social Finder Configuration
+FINDER_BACKEND = os.environ.get("FINDER_BACKEND", "inprocess")  # inprocess | lambda
+FINDER_FUNCTION_NAME = os.environ.get("FINDER_FUNCTION_NAME", "")  # Required by the lambda backend
+FINDER_THREADS = int(os.environ.get("FINDER_THREADS", "4"))
+FINDER_TIMEOUT_SECONDS = float(os.environ.get("FINDER_TIMEOUT_SECONDS", "25"))
 
 # Bedrock Model Configuration
 BEDROCK_EMBED_MODEL_ID = os.environ.get("BEDROCK_EMBED_MODEL_ID", "cohere.embed-multilingual-v3")
 BEDROCK_GENERATE_MODEL_ID = os.environ.get("BEDROCK_GENERATE_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+# Cache checkpoint on the static system prompt; only applied for models that support
+# Bedrock prompt caching and prompts at least as long as the model's minimum cacheable prefix
+PROMPT_CACHE_ENABLED = os.environ.get("PROMPT_CACHE_ENABLED", "true").lower() == "true"
 
 # Serper Configuration
 SERPER_API_KEY = os.environ.get("SERPER_API_KEY", "")
+
+# Bedrock Resilience Configuration
+# Worst case per call is BEDROCK_MAX_ATTEMPTS x (connect + read timeout) = 2 x 12s = 24s
+# by default; two sequential calls (embedding, then rationale) must fit inside the 60s
+# function timeout. BEDROCK_MAX_ATTEMPTS counts the first call (botocore total_max_attempts).
+BEDROCK_CONNECT_TIMEOUT_SECONDS = int(os.environ.get("BEDROCK_CONNECT_TIMEOUT_SECONDS", "2"))
+BEDROCK_READ_TIMEOUT_SECONDS = int(os.environ.get("BEDROCK_READ_TIMEOUT_SECONDS", "10"))
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "2"))  # Sustained failure is left to the circuit breaker
+BREAKER_FAILURE_RATE = float(os.environ.get("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.environ.get("BREAKER_SLOW_CALL_SECONDS", "10"))
+BREAKER_MINIMUM_CALLS = int(os.environ.get("BREAKER_MINIMUM_CALLS", "5"))
+BREAKER_WINDOW_SECONDS = float(os.environ.get("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_OPEN_SECONDS = float(os.environ.get("BREAKER_OPEN_SECONDS", "30"))
+
+# Retrieval Configuration
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")  # hybrid | keyword
+HYBRID_CONFIDENCE_THRESHOLD = float(os.environ.get("HYBRID_CONFIDENCE_THRESHOLD", "0.5"))
+RRF_K = int(os.environ.get("RRF_K", "60"))
+
+# Agency Match Memo Configuration
+MATCH_CACHE_SIZE = int(os.environ.get("MATCH_CACHE_SIZE", "1024"))
+MATCH_CACHE_TTL_SECONDS = float(os.environ.get("MATCH_CACHE_TTL_SECONDS", "900"))
+MATCH_VERSION_CHECK_SECONDS = float(os.environ.get("MATCH_VERSION_CHECK_SECONDS", "60"))
+AGENCY_STORE_SIZE = int(os.environ.get("AGENCY_STORE_SIZE", "4096"))  # Interned agency records per container
+
+# Tracing Configuration
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.05"))  # Random share kept besides slow/error traces
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", "3000"))  # Traces slower than this are always kept
+
+# HTTP Server Mode Configuration (src/server.py)
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", "8080"))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", str(os.cpu_count() or 1)))  # Worker processes
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", "32"))  # Concurrent requests per worker
+SERVER_MAX_BODY_BYTES = int(os.environ.get("SERVER_MAX_BODY_BYTES", "65536"))
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "50"))  # Keep-alive connections per AWS/HTTP client
+
+# Input Token Budget Configuration
+MAX_INPUT_TOKENS = int(os.environ.get("MAX_INPUT_TOKENS", "400"))  # Longer complaints are trimmed before prompting
+REJECT_INPUT_TOKENS = int(os.environ.get("REJECT_INPUT_TOKENS", "3000"))  # Longer complaints are rejected
+MAX_MATCH_KEYWORDS = int(os.environ.get("MAX_MATCH_KEYWORDS", "24"))  # Keyword index queries per complaint
+
+# Rationale Fast Path Configuration
+RATIONALE_TEMPLATE_CONFIDENCE = float(os.environ.get("RATIONALE_TEMPLATE_CONFIDENCE", "0.6"))  # Keyword match confidence above which the rationale skips Bedrock
+
+# Embedding Batching Configuration
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "96"))  # Cohere embed v3 accepts up to 96 texts per call
+EMBED_MICROBATCH = os.environ.get("EMBED_MICROBATCH", "false").lower() == "true"  # Coalesce concurrent get_embedding calls
+EMBED_MICROBATCH_WAIT_MS = float(os.environ.get("EMBED_MICROBATCH_WAIT_MS", "5"))
+
+# Response Caching and Compression Configuration
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "512"))  # Cached /generate responses per container
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "300"))
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))  # Smaller bodies are sent uncompressed
+
+# Admission Control Configuration
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "dynamodb")  # dynamodb | memory
+RATE_LIMIT_TABLE_NAME = os.environ.get("RATE_LIMIT_TABLE_NAME", "BijakMengeluhRateLimitTable")
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", "10"))  # Requests a client may send at once
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_PER_MINUTE", "6"))  # Sustained requests per client
+# Server mode only: new requests get 429 at this many in-flight Bedrock calls in the worker
+# process (0 disables). A Lambda container runs one invocation at a time, so it never
+# gets close; use reserved concurrency there.
+SHED_INFLIGHT_BEDROCK = int(os.environ.get("SHED_INFLIGHT_BEDROCK", "0"))
+SERVER_TRUST_PROXY = os.environ.get("SERVER_TRUST_PROXY", "false").lower() == "true"  # Server mode: client IP from the last X-Forwarded-For entry (true in the Docker image)
@@ -1,2 +1,21 @@
-from .complaint_handler import lambda_handler as complaint_lambda_handler
-from .social_finder_handler import lambda_handler as social_finder_lambda_handler
+"""
+Handlers are imported on first access: each Lambda loads its own handler
+module, and importing this package must not pull in the other one.
+"""
+import importlib
+
+_EXPORTS = {
+    "complaint_lambda_handler": (".complaint_handler", "lambda_handler"),
+    "social_finder_lambda_handler": (".social_finder_handler", "lambda_handler"),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr = _EXPORTS[name]
+    value = getattr(importlib.import_module(module_name, __name__), attr)
+    globals()[name] = value
+    return value
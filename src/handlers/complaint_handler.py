@@ -1,11 +1,19 @@
 import json
 import time
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from concurrent.futures import ThreadPoolExecutor
 
-from services import BedrockService, PineconeService, SocialLookupService
+from config import settings
+from models import ComplaintResult, Ministry, SocialHandleInfo
+from models.serialization import dumps
+from services import (
+    BedrockService, PineconeService, SocialLookupService,
+    rate_limiter, response_encoding, template_fallback, token_budget, tracing
+)
 from services.dynamodb_matcher import DynamoDBMatcher
+from services.rank_fusion import hybrid_contacts
+from services.ttl_cache import TTLCache
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -16,65 +24,195 @@ pinecone_service = PineconeService()
 social_lookup_service = SocialLookupService()
 dynamodb_matcher = DynamoDBMatcher()
 
-def process_complaint(user_prompt: str, tone: str = "formal") -> Dict[str, Any]:
+# Serialized responses by (complaint, tone), so client retries and polls get
+# the same body and ETag: {'body', 'etag', 'variants': {encoding: base64 body}}
+result_cache = TTLCache(settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_TTL_SECONDS)
+
+# Per-client token buckets (None when RATE_LIMIT_ENABLED is false)
+client_limiter = rate_limiter.limiter_from_settings()
+
+def semantic_contacts(user_prompt: str, top_k: int = 3) -> List[Ministry]:
+    """Embedding-based retrieval via Pinecone; returns [] on failure so keyword results still stand."""
+    query_embedding = bedrock_service.get_embedding(user_prompt)
+    if not query_embedding:
+        return []
+    try:
+        return pinecone_service.find_relevant_ministries(query_embedding, top_k)
+    except Exception as e:
+        logger.error(f"Pinecone query failed: {e}", exc_info=True)
+        return []
+
+def templated_rationale(user_prompt: str, top_match: Ministry) -> Optional[str]:
+    """
+    Deterministic rationale for a strong, unambiguous keyword match.
+    Returns None when the match is not confident enough, leaving it to Bedrock.
+    """
+    matched = top_match.matched_keywords
+    if not matched or (top_match.match_confidence or 0.0) < settings.RATIONALE_TEMPLATE_CONFIDENCE:
+        return None
+    logger.info(f"Templated rationale for {top_match.name} (confidence {top_match.match_confidence:.2f})")
+    return template_fallback.render_rationale(
+        user_prompt,
+        top_match.name,
+        top_match.description,
+        keywords=list(matched[:3]),
+        functions=list(top_match.agency.keywords) if top_match.agency else None
+    )
+
+@tracing.traced("process_complaint")
+def process_complaint(user_prompt: str, tone: str = "formal") -> ComplaintResult:
     """
     Main business logic to process a user complaint with parallel execution.
-    1. Try DynamoDB keyword matching first (fast, cheap)
-    2. Fallback to Pinecone if DynamoDB returns no results
-    3. Generate formal complaint text (parallel)
-    4. Generate rationale for top ministry (parallel with social lookup)
+    1. DynamoDB keyword matching (fast, cheap), then trim the complaint to
+       the token budget keeping the sentences with matched keywords
+    2. Generate complaint text in the background
+    3. If keyword confidence is low, run Pinecone retrieval while the text
+       generates and fuse both rankings
+    4. Generate rationale for top ministry (parallel with social lookup);
+       high-confidence keyword matches use a template instead of Bedrock
     5. Retrieve social media handle
     
     Args:
         user_prompt: The user's complaint text
         tone: The tone of the complaint (formal, funny, angry)
     """
-    # Step 1: Try DynamoDB first
-    suggested_contacts = dynamodb_matcher.match_agencies(user_prompt, top_k=3)
-    
-    # Fallback to Pinecone if no DynamoDB results
-    if not suggested_contacts:
-        logger.info("DynamoDB returned no results, falling back to Pinecone")
-        query_embedding = bedrock_service.get_embedding(user_prompt)
-        if query_embedding:
-            suggested_contacts = pinecone_service.find_relevant_ministries(query_embedding, 3)
-    else:
-        logger.info(f"DynamoDB matched {len(suggested_contacts)} agencies")
-    
-    # Step 2: Generate complaint text in parallel
-    generated_text = bedrock_service.generate_complaint_text(user_prompt, tone)
-    
-    # Step 3 & 4: Generate rationale and get social handle in parallel
     rationale = ""
-    social_handle_info = {"handle": "NOT_FOUND", "status": "none"}
+    social_handle_info = SocialHandleInfo(handle="NOT_FOUND", status="none")
+    degraded = False
     
-    if suggested_contacts:
-        top_match = suggested_contacts[0]
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_rationale = executor.submit(
-                bedrock_service.generate_rationale,
-                user_prompt,
-                top_match['name'],
-                top_match['description']
-            )
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # Step 1: Keyword matching
+        keyword_contacts = dynamodb_matcher.match_agencies(user_prompt, top_k=3)
+        
+        # Everything sent to Bedrock below uses the budgeted text
+        matched_keywords = {k for c in keyword_contacts for k in c.matched_keywords}
+        prompt_text = token_budget.trim_to_budget(user_prompt, matched_keywords)
+        if prompt_text != user_prompt:
+            logger.info(f"Trimmed complaint from ~{token_budget.estimate_tokens(user_prompt)} "
+                        f"to ~{token_budget.estimate_tokens(prompt_text)} tokens")
+            tracing.get_current_span().set_attribute("input.trimmed", True)
+        
+        # Step 2: Generation doesn't depend on the final ranking, so it overlaps
+        # with the semantic branch (the agency name is only used by the template fallback).
+        # Worker threads are bound to this trace so their spans nest under process_complaint.
+        top_agency_name = keyword_contacts[0].name if keyword_contacts else None
+        future_text = executor.submit(
+            tracing.bind(bedrock_service.generate_complaint_text), prompt_text, tone, top_agency_name
+        )
+        
+        # Step 3: Hybrid retrieval
+        suggested_contacts = hybrid_contacts(prompt_text, keyword_contacts, semantic_contacts, top_k=3)
+        
+        # Step 4 & 5: Generate rationale and get social handle in parallel
+        if suggested_contacts:
+            top_match = suggested_contacts[0]
+            rationale = templated_rationale(prompt_text, top_match)
+            future_rationale = None
+            if rationale is None:
+                future_rationale = executor.submit(
+                    tracing.bind(bedrock_service.generate_rationale),
+                    prompt_text,
+                    top_match.name,
+                    top_match.description,
+                    list(top_match.matched_keywords[:3])
+                )
+            tracing.get_current_span().set_attribute("rationale.templated", future_rationale is None)
             future_social = executor.submit(
-                social_lookup_service.get_social_handle,
-                top_match['name']
+                tracing.bind(social_lookup_service.get_social_handle),
+                top_match.name
             )
             
-            rationale = future_rationale.result()
+            if future_rationale is not None:
+                generated_rationale = future_rationale.result()
+                rationale = generated_rationale.text
+                degraded = degraded or generated_rationale.fallback
             social_handle_info = future_social.result()
+            # A ministry without a handle is a normal result; only a failed lookup is degraded
+            degraded = degraded or social_handle_info.status == "error"
+        
+        generated = future_text.result()
+    
+    return ComplaintResult(
+        generated_text=generated.text,
+        suggested_contacts=suggested_contacts,
+        rationale=rationale,
+        social_handle_info=social_handle_info,
+        degraded=degraded or generated.fallback
+    )
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """AWS Lambda entry point; the whole request is one trace (joined to a caller's traceparent header if present)."""
+    parent = tracing.extract({k.lower(): v for k, v in (event.get('headers') or {}).items()})
+    with tracing.get_tracer(__name__).start_as_current_span("POST /generate", context=parent) as span:
+        response = _handle_request(event)
+        span.set_attribute("http.status_code", response['statusCode'])
+        if response['statusCode'] >= 500:
+            span.set_status(tracing.StatusCode.ERROR)
+        return response
+
+def _cached_response(entry: Dict[str, Any], headers: Dict[str, str], cache_status: str,
+                     elapsed_time: float = 0.0) -> Dict[str, Any]:
+    """200 (compressed when accepted) or 304 for a result cache entry."""
+    response_headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',
+        'Access-Control-Allow-Methods': 'OPTIONS,POST',
+        'Access-Control-Expose-Headers': 'ETag,X-Cache',
+        'ETag': entry['etag'],
+        'Vary': 'Accept-Encoding',
+        'X-Cache': cache_status,
+        'X-Processing-Time': f'{elapsed_time:.2f}s'
+    }
+    if response_encoding.etag_matches(headers.get('if-none-match'), entry['etag']):
+        return {'statusCode': 304, 'headers': response_headers, 'body': ''}
     
+    encoding = response_encoding.negotiate_encoding(headers.get('accept-encoding'))
+    encoded = response_encoding.encode_body(
+        entry['body'], encoding, settings.COMPRESSION_MIN_BYTES, entry['variants']
+    )
+    response_headers.update(encoded['headers'])
     return {
-        'generated_text': generated_text,
-        'suggested_contacts': suggested_contacts,
-        'rationale': rationale,
-        'social_handle_info': social_handle_info
+        'statusCode': 200,
+        'headers': response_headers,
+        'body': encoded['body'],
+        'isBase64Encoded': encoded['isBase64Encoded']
     }
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """AWS Lambda entry point."""
+def _too_many_requests(retry_after: float) -> Dict[str, Any]:
+    seconds = rate_limiter.retry_after_header(retry_after)
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'Retry-After',
+            'Retry-After': seconds
+        },
+        'body': json.dumps({'error': f'Terlalu banyak permintaan. Coba lagi dalam {seconds} detik ya.'})
+    }
+
+def _admit(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Admission control for requests that would run process_complaint.
+    Returns a 429 response when Bedrock is saturated in this process
+    (server mode, SHED_INFLIGHT_BEDROCK > 0) or the client has used up its
+    token bucket, otherwise None.
+    """
+    in_flight = rate_limiter.bedrock_in_flight.value
+    if settings.SHED_INFLIGHT_BEDROCK and in_flight >= settings.SHED_INFLIGHT_BEDROCK:
+        logger.warning(f"Shedding request: {in_flight} Bedrock calls in flight")
+        return _too_many_requests(1)
+    
+    if client_limiter is not None:
+        key = rate_limiter.client_key(event)
+        allowed, retry_after = client_limiter.acquire(key)
+        if not allowed:
+            logger.warning(f"Rate limited {key}, retry after {retry_after:.1f}s")
+            return _too_many_requests(retry_after)
+    return None
+
+def _handle_request(event: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Received complaint generation request")
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
     
     try:
         body = json.loads(event.get('body', '{}'))
@@ -97,30 +235,41 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({'error': 'Keluhan terlalu pendek. Minimal 20 karakter ya.'})
             }
         
+        budget_action, _ = token_budget.check(user_complaint)
+        if budget_action == "reject":
+            return {
+                'statusCode': 400,
+                'headers': {'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Keluhan terlalu panjang. Ringkas dulu ya.'})
+            }
+        
+        cache_key = (" ".join(user_complaint.split()), tone)
+        entry = result_cache.get(cache_key)
+        tracing.get_current_span().set_attribute("result_cache.hit", entry is not None)
+        if entry is not None:
+            logger.info("Serving complaint result from cache")
+            return _cached_response(entry, headers, 'HIT')
+        
+        # Cache hits above are free; only new work is admission-controlled
+        rejection = _admit(event)
+        if rejection is not None:
+            tracing.get_current_span().set_attribute("admission.rejected", True)
+            return rejection
+        
         start_time = time.time()
         result = process_complaint(user_complaint, tone)
         elapsed_time = time.time() - start_time
         
         logger.info(f"Processing completed in {elapsed_time:.2f} seconds")
         
-        # Check if there was an error in processing
-        if 'error' in result:
-            return {
-                'statusCode': 500,
-                'headers': {'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps(result)
-            }
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST',
-                'X-Processing-Time': f'{elapsed_time:.2f}s'
-            },
-            'body': json.dumps(result)
-        }
+        response_body = dumps(result)
+        entry = {'body': response_body, 'etag': response_encoding.etag(response_body), 'variants': {}}
+        if result.degraded:
+            # Fallback output would outlive the outage; the next request retries Bedrock and the lookup
+            logger.info("Degraded result, not caching")
+            return _cached_response(entry, headers, 'BYPASS', elapsed_time)
+        result_cache.put(cache_key, entry)
+        return _cached_response(entry, headers, 'MISS', elapsed_time)
     
     except json.JSONDecodeError:
         logger.error("Invalid JSON in request body")
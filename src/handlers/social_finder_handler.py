@@ -2,10 +2,13 @@ import boto3
 import json
 import re
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 from typing import Dict, Any, Optional
 
 from config import settings
+from services import tracing
+from services.rate_limiter import bedrock_in_flight
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -13,6 +16,7 @@ logger.setLevel(logging.INFO)
 # Initialize clients
 bedrock_runtime = boto3.client(service_name='bedrock-runtime', region_name=settings.AWS_REGION)
 requests_session = requests.Session()
+requests_session.mount('https://', HTTPAdapter(pool_maxsize=settings.HTTP_POOL_CONNECTIONS))
 
 # Prompt template
 HANDLE_EXTRACTION_PROMPT = """Human: I have performed a web search for the official X/Twitter handle for "{ministry_name}".
@@ -38,6 +42,7 @@ Guidelines:
 JSON Response:
 Assistant:"""
 
+@tracing.traced("serper.search")
 def call_serper_api(query: str) -> Optional[Dict[str, Any]]:
     """Performs a web search using the Serper API."""
     logger.info(f"Calling Serper API with query: '{query}'")
@@ -57,8 +62,12 @@ def call_serper_api(query: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Serper API call failed: {e}")
         return None
 
+@tracing.traced("bedrock.extract_handle")
 def extract_handle_with_bedrock(ministry_name: str, search_results_text: str) -> Dict[str, str]:
-    """Uses Bedrock to extract Twitter handle from search results."""
+    """
+    Uses Bedrock to extract Twitter handle from search results.
+    A failed call or a response without the JSON object gets status "error".
+    """
     logger.info(f"Extracting handle for '{ministry_name}' using Bedrock")
     
     prompt = HANDLE_EXTRACTION_PROMPT.format(
@@ -73,13 +82,14 @@ def extract_handle_with_bedrock(ministry_name: str, search_results_text: str) ->
     }
     
     try:
-        response = bedrock_runtime.invoke_model(
-            body=json.dumps(body),
-            modelId=settings.BEDROCK_GENERATE_MODEL_ID,
-            accept='application/json',
-            contentType='application/json'
-        )
-        response_body = json.loads(response.get('body').read())
+        with bedrock_in_flight:
+            response = bedrock_runtime.invoke_model(
+                body=json.dumps(body),
+                modelId=settings.BEDROCK_GENERATE_MODEL_ID,
+                accept='application/json',
+                contentType='application/json'
+            )
+            response_body = json.loads(response.get('body').read())
         
         if response_body and 'content' in response_body and response_body['content']:
             raw_text = response_body['content'][0].get('text', '').strip()
@@ -93,13 +103,19 @@ def extract_handle_with_bedrock(ministry_name: str, search_results_text: str) ->
                     "handle": result.get("handle", "NOT_FOUND"),
                     "confidence": result.get("confidence", "none")
                 }
+        logger.warning("Bedrock response had no handle JSON")
     except Exception as e:
         logger.error(f"Error extracting handle with Bedrock: {e}", exc_info=True)
     
-    return {"handle": "NOT_FOUND", "confidence": "none"}
+    return {"handle": "NOT_FOUND", "confidence": "none", "status": "error"}
 
+@tracing.traced("find_social_handle")
 def find_social_handle(ministry_name: str) -> Dict[str, str]:
-    """Main logic to find social media handle for a ministry."""
+    """
+    Main logic to find social media handle for a ministry.
+    Serper or Bedrock failures return status "error", so callers can tell a
+    failed lookup from a ministry without a handle.
+    """
     logger.info(f"Finding social handle for: {ministry_name}")
     
     # Perform web search
@@ -107,7 +123,7 @@ def find_social_handle(ministry_name: str) -> Dict[str, str]:
     search_results = call_serper_api(query)
     
     if not search_results:
-        return {"handle": "NOT_FOUND", "confidence": "none"}
+        return {"handle": "NOT_FOUND", "confidence": "none", "status": "error"}
     
     # Format search results for Bedrock
     organic_results = search_results.get('organic', [])
@@ -124,7 +140,15 @@ def find_social_handle(ministry_name: str) -> Dict[str, str]:
     return extract_handle_with_bedrock(ministry_name, search_results_text)
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """AWS Lambda entry point for social finder."""
+    """AWS Lambda entry point for social finder; continues the caller's trace from the event's traceparent."""
+    with tracing.get_tracer(__name__).start_as_current_span("social_finder", context=tracing.extract(event)) as span:
+        response = _handle_event(event)
+        span.set_attribute("status_code", response['statusCode'])
+        if response['statusCode'] >= 500:
+            span.set_status(tracing.StatusCode.ERROR)
+        return response
+
+def _handle_event(event: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Social finder Lambda invoked")
     
     try:
@@ -1 +1 @@
-from .complaint import Ministry, SocialHandleInfo, ComplaintResult
+from .complaint import AgencyRecord, Ministry, SocialHandleInfo, ComplaintResult, Generation
@@ -1,20 +1,107 @@
-from typing import Dict, List
-from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from types import MappingProxyType
+from dataclasses import dataclass, field, replace
 
-@dataclass
+from models.serialization import encode
+
+@dataclass(frozen=True, slots=True)
+class AgencyRecord:
+    """Agency contact details; one shared instance per agency (see DynamoDBMatcher's agency store)."""
+    agency_id: str
+    name: str
+    level: str
+    social_media: Mapping[str, Optional[str]]
+    website: Optional[str]
+    phone: Optional[str]
+    email: Optional[str]
+    keywords: Tuple[str, ...]
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "AgencyRecord":
+        return cls(
+            agency_id=item['agency_id'],
+            name=item.get('name', ''),
+            level=item.get('level', ''),
+            social_media=MappingProxyType(dict(item.get('social_media') or {})),
+            website=item.get('website'),
+            phone=item.get('phone'),
+            email=item.get('email'),
+            keywords=tuple(item.get('keywords') or ())
+        )
+
+@dataclass(frozen=True, slots=True)
 class Ministry:
+    """
+    A suggested contact; keyword matches reference their AgencyRecord instead
+    of copying it. Instances are immutable and shared through the match memo,
+    so the encoded JSON is cached on first use.
+    """
     name: str
     score: float
     description: str
+    agency: Optional[AgencyRecord] = None
+    matched_keywords: Tuple[str, ...] = ()
+    match_confidence: Optional[float] = None
+    _json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    def with_score(self, score: float) -> "Ministry":
+        return replace(self, score=score)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {'name': self.name, 'score': self.score, 'description': self.description}
+        if self.agency is not None:
+            data.update({
+                'social_media': dict(self.agency.social_media),
+                'website': self.agency.website,
+                'phone': self.agency.phone,
+                'email': self.agency.email,
+                'matched_keywords': list(self.matched_keywords),
+                'match_confidence': self.match_confidence
+            })
+        return data
 
-@dataclass
+    def to_json(self) -> str:
+        if self._json is None:
+            object.__setattr__(self, '_json', encode(self.to_dict()))
+        return self._json
+
+@dataclass(frozen=True, slots=True)
+class Generation:
+    """Generated text; `fallback` is set when it came from a local template because Bedrock was unavailable."""
+    text: str
+    fallback: bool = False
+
+@dataclass(frozen=True, slots=True)
 class SocialHandleInfo:
     handle: str
     status: str
 
-@dataclass
+    def to_dict(self) -> Dict[str, str]:
+        return {'handle': self.handle, 'status': self.status}
+
+@dataclass(frozen=True, slots=True)
 class ComplaintResult:
     generated_text: str
-    suggested_contacts: List[Dict]
+    suggested_contacts: List[Ministry]
     rationale: str
-    social_handle_info: Dict[str, str]
+    social_handle_info: SocialHandleInfo
+    # Set when any part is a fallback (Bedrock unavailable, social lookup failed);
+    # not part of the response body
+    degraded: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'generated_text': self.generated_text,
+            'suggested_contacts': [contact.to_dict() for contact in self.suggested_contacts],
+            'rationale': self.rationale,
+            'social_handle_info': self.social_handle_info.to_dict()
+        }
+
+    def to_json(self) -> str:
+        contacts = ",".join(contact.to_json() for contact in self.suggested_contacts)
+        return (
+            f'{{"generated_text":{encode(self.generated_text)},'
+            f'"suggested_contacts":[{contacts}],'
+            f'"rationale":{encode(self.rationale)},'
+            f'"social_handle_info":{encode(self.social_handle_info.to_dict())}}}'
+        )
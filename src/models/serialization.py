@@ -0,0 +1,48 @@
+"""
+Fast JSON serialization for response bodies
+
+Models that define to_json() assemble their JSON from pre-encoded fragments
+(interned agency records are encoded once, not per response). Everything else
+goes through orjson when it is installed, or a shared compact stdlib encoder.
+"""
+import json
+from decimal import Decimal
+from typing import Any, Mapping
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# json.dumps builds a new encoder per call when given options; reuse one instead.
+# ASCII escaping keeps emoji in generated text from widening the whole string to 4 bytes/char.
+_encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+
+def encode(obj: Any) -> str:
+    """Encodes plain values (and models via to_dict) as compact JSON."""
+    if orjson is not None:
+        # Dataclasses go through to_dict() rather than orjson's field-by-field encoding
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_PASSTHROUGH_DATACLASS).decode('utf-8')
+    return _encoder.encode(obj)
+
+
+def dumps(obj: Any) -> str:
+    """Serializes a response body: models with to_json() directly, anything else via encode()."""
+    to_json = getattr(obj, 'to_json', None)
+    if to_json is not None:
+        return to_json()
+    return encode(obj)
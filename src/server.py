@@ -0,0 +1,212 @@
+"""
+HTTP server mode (ASGI) for running the backend as a long-lived service
+
+Routes:
+    POST /generate        complaint generation (same handler as the Lambda)
+    POST /social-handle   social finder, body: {"ministry_name": "..."}
+    GET  /health          liveness check for load balancers
+
+Each worker process keeps its service clients, connection pools and match
+memo for its whole lifetime, so there are no cold starts after boot. The
+handlers are blocking (boto3), so requests run on a bounded thread pool while
+the event loop keeps accepting new ones.
+
+Run:
+    cd src && python server.py           # SERVER_WORKERS processes
+    cd src && uvicorn server:app --workers 4
+"""
+import json
+import base64
+import asyncio
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from handlers import complaint_handler, social_finder_handler
+
+logger = logging.getLogger(__name__)
+
+# Matches the HTTP API CorsConfiguration in template.yaml
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST',
+    'Access-Control-Expose-Headers': 'ETag,X-Cache,Retry-After'
+}
+
+_executor = ThreadPoolExecutor(max_workers=settings.SERVER_THREADS, thread_name_prefix='request')
+
+
+def _generate(event: Dict[str, Any]) -> Dict[str, Any]:
+    return complaint_handler.lambda_handler(event, None)
+
+
+def _social_handle(event: Dict[str, Any]) -> Dict[str, Any]:
+    # The finder Lambda takes a direct-invoke payload rather than an HTTP event
+    try:
+        payload = json.loads(event.get('body') or '{}')
+    except json.JSONDecodeError:
+        return _json_response(400, {'error': 'Format data salah. Coba lagi ya.'})
+    if not isinstance(payload, dict):
+        return _json_response(400, {'error': 'ministry_name is required'})
+    traceparent = event['headers'].get('traceparent')
+    if traceparent:
+        payload['traceparent'] = traceparent
+    return social_finder_handler.lambda_handler(payload, None)
+
+
+ROUTES: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    ('POST', '/generate'): _generate,
+    ('POST', '/social-handle'): _social_handle,
+}
+
+
+def _json_response(status: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {'statusCode': status, 'headers': {}, 'body': json.dumps(body)}
+
+
+def build_event(method: str, path: str, headers: Dict[str, str], body: bytes, source_ip: Optional[str] = None) -> Dict[str, Any]:
+    """Builds an API Gateway HTTP API (payload v2) event so the Lambda handlers run unchanged."""
+    try:
+        text, is_base64 = body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        text, is_base64 = base64.b64encode(body).decode('ascii'), True
+    return {
+        'version': '2.0',
+        'rawPath': path,
+        'headers': headers,
+        'body': text,
+        'isBase64Encoded': is_base64,
+        'requestContext': {'http': {'method': method, 'path': path, 'sourceIp': source_ip}}
+    }
+
+
+async def handle_event(method: str, path: str, event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Native async entry point: dispatches an event to its handler on the
+    request pool, so one worker serves many requests concurrently.
+    """
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        if any(route_path == path for _, route_path in ROUTES):
+            return _json_response(405, {'error': 'Method not allowed'})
+        return _json_response(404, {'error': 'Not found'})
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, handler, event))
+
+
+def _client_ip(scope: Dict[str, Any], headers: Dict[str, str]) -> Optional[str]:
+    """
+    Client address for rate limiting. X-Forwarded-For is only trusted behind a
+    proxy (SERVER_TRUST_PROXY), and only its last entry, the address the proxy
+    itself saw: earlier entries come from the client and can be forged.
+    """
+    forwarded = headers.get('x-forwarded-for')
+    if settings.SERVER_TRUST_PROXY and forwarded:
+        return forwarded.split(',')[-1].strip()
+    client = scope.get('client')
+    return client[0] if client else None
+
+
+async def _read_body(receive: Callable) -> Optional[bytes]:
+    """Reads the request body; returns None if it exceeds SERVER_MAX_BODY_BYTES."""
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return b''.join(chunks)
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > settings.SERVER_MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _send_response(send: Callable, response: Dict[str, Any]):
+    body = response.get('body') or ''
+    body_bytes = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+
+    headers = {**CORS_HEADERS, **(response.get('headers') or {})}
+    headers.setdefault('Content-Type', 'application/json')
+    headers['Content-Length'] = str(len(body_bytes))
+
+    await send({
+        'type': 'http.response.start',
+        'status': response['statusCode'],
+        'headers': [(k.lower().encode('latin-1'), str(v).encode('latin-1')) for k, v in headers.items()]
+    })
+    await send({'type': 'http.response.body', 'body': body_bytes})
+
+
+async def _lifespan(receive: Callable, send: Callable):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope: Dict[str, Any], receive: Callable, send: Callable):
+    """ASGI application."""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    method, path = scope['method'], scope['path']
+    if method == 'GET' and path == '/health':
+        await _send_response(send, _json_response(200, {'status': 'ok'}))
+        return
+    if method == 'OPTIONS':
+        await _send_response(send, {'statusCode': 204, 'headers': {'Access-Control-Max-Age': '600'}, 'body': ''})
+        return
+
+    body = await _read_body(receive)
+    if body is None:
+        await _send_response(send, _json_response(413, {'error': 'Keluhan terlalu panjang.'}))
+        return
+
+    headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+    try:
+        response = await handle_event(method, path, build_event(method, path, headers, body, _client_ip(scope, headers)))
+    except Exception as e:
+        logger.error(f"Unhandled error for {method} {path}: {e}", exc_info=True)
+        response = _json_response(500, {'error': 'Ada masalah di server. Coba lagi dalam beberapa saat.'})
+    await _send_response(send, response)
+
+
+def main():
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required for server mode: pip install -r requirements-server.txt")
+
+    logging.basicConfig(level=logging.INFO)
+    if settings.RATE_LIMIT_ENABLED and not settings.SERVER_TRUST_PROXY:
+        logger.warning(
+            "SERVER_TRUST_PROXY is off: clients are rate limited by the connecting address, "
+            "so behind a load balancer every request shares one bucket"
+        )
+    uvicorn.run(
+        'server:app',
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        timeout_keep_alive=75
+    )
+
+
+if __name__ == '__main__':
+    main()
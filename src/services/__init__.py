@@ -1,4 +1,24 @@
-from .bedrock_service import BedrockService
-from .pinecone_service import PineconeService
-from .cache_service import CacheService
-from .social_lookup_service import SocialLookupService
+"""
+Service classes are imported on first access, so the social finder Lambda,
+which only needs `services.tracing` and `services.rate_limiter`, doesn't load
+the Bedrock, Pinecone and cache services at cold start.
+"""
+import importlib
+
+_EXPORTS = {
+    "BedrockService": ".bedrock_service",
+    "PineconeService": ".pinecone_service",
+    "CacheService": ".cache_service",
+    "SocialLookupService": ".social_lookup_service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
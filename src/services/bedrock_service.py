@@ -1,83 +1,259 @@
 import json
+import time
 import logging
-from typing import List, Dict, Any
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional
 import boto3
 from botocore.config import Config
 
 from config import settings, prompts
+from models import Generation
+from services import template_fallback, token_budget, tracing
+from services.circuit_breaker import CircuitBreaker
+from services.micro_batcher import MicroBatcher
+from services.rate_limiter import bedrock_in_flight
 
 logger = logging.getLogger(__name__)
 
+# Model families with Bedrock prompt caching and their minimum cacheable
+# prefix in tokens (matched against the model id, so cross-region profiles
+# like "apac.anthropic..." are covered). Shorter prefixes are never cached.
+PROMPT_CACHE_MIN_TOKENS = {
+    "claude-3-5-haiku": 2048,
+    "claude-3-7-sonnet": 1024,
+    "claude-sonnet-4": 1024,
+    "claude-opus-4": 1024,
+    "claude-haiku-4": 4096,
+}
+
+def prompt_cache_min_tokens(model_id: str) -> Optional[int]:
+    """Minimum cacheable prefix for a model, or None if it doesn't support prompt caching."""
+    for family, min_tokens in PROMPT_CACHE_MIN_TOKENS.items():
+        if family in model_id:
+            return min_tokens
+    return None
+
+def supports_prompt_cache(model_id: str) -> bool:
+    return prompt_cache_min_tokens(model_id) is not None
+
 class BedrockService:
     def __init__(self):
-        retry_config = Config(retries={'max_attempts': 5, 'mode': 'adaptive'})
+        retry_config = Config(
+            retries={'total_max_attempts': settings.BEDROCK_MAX_ATTEMPTS, 'mode': 'standard'},
+            connect_timeout=settings.BEDROCK_CONNECT_TIMEOUT_SECONDS,
+            read_timeout=settings.BEDROCK_READ_TIMEOUT_SECONDS,
+            max_pool_connections=settings.HTTP_POOL_CONNECTIONS
+        )
         self.client = boto3.client(
             service_name='bedrock-runtime',
             region_name=settings.AWS_REGION,
             config=retry_config
         )
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        # None when caching is off or the generation model doesn't support it
+        self.prompt_cache_min_tokens = (
+            prompt_cache_min_tokens(settings.BEDROCK_GENERATE_MODEL_ID) if settings.PROMPT_CACHE_ENABLED else None
+        )
+        self._usage = Counter()
+        self._usage_lock = threading.Lock()
+        self._query_batcher = MicroBatcher(
+            lambda texts: self.get_embeddings(texts, input_type="search_query"),
+            max_batch=settings.EMBED_BATCH_SIZE,
+            max_wait_seconds=settings.EMBED_MICROBATCH_WAIT_MS / 1000
+        ) if settings.EMBED_MICROBATCH else None
+    
+    def _breaker(self, model_id: str) -> CircuitBreaker:
+        """Returns the circuit breaker for a model id, creating it on first use."""
+        with self._breakers_lock:
+            breaker = self._breakers.get(model_id)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name=model_id,
+                    failure_rate_threshold=settings.BREAKER_FAILURE_RATE,
+                    slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+                    minimum_calls=settings.BREAKER_MINIMUM_CALLS,
+                    window_seconds=settings.BREAKER_WINDOW_SECONDS,
+                    open_seconds=settings.BREAKER_OPEN_SECONDS
+                )
+                self._breakers[model_id] = breaker
+            return breaker
     
     def _invoke_model(self, model_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
-        """Invokes a Bedrock model and returns the parsed JSON response."""
-        logger.info(f"Invoking Bedrock model: {model_id}")
-        try:
-            response = self.client.invoke_model(
-                body=json.dumps(body),
-                modelId=model_id,
-                accept='application/json',
-                contentType='application/json'
-            )
-            response_body = json.loads(response.get('body').read())
+        """
+        Invokes a Bedrock model and returns the parsed JSON response.
+        Returns an empty dict without calling Bedrock while the model's circuit is open.
+        """
+        with tracing.get_tracer(__name__).start_as_current_span("bedrock.invoke_model") as span:
+            span.set_attribute("bedrock.model_id", model_id)
+            breaker = self._breaker(model_id)
+            if not breaker.allow_request():
+                span.set_attribute("breaker.state", breaker.state)
+                logger.warning(f"Circuit open for {model_id}, skipping Bedrock call")
+                return {}
+            
+            logger.info(f"Invoking Bedrock model: {model_id}")
+            start_time = time.monotonic()
+            try:
+                with bedrock_in_flight:
+                    response = self.client.invoke_model(
+                        body=json.dumps(body),
+                        modelId=model_id,
+                        accept='application/json',
+                        contentType='application/json'
+                    )
+                    response_body = json.loads(response.get('body').read())
+            except Exception as e:
+                breaker.record_failure(time.monotonic() - start_time)
+                span.record_exception(e)
+                span.set_status(tracing.StatusCode.ERROR, str(e))
+                logger.error(f"Error invoking Bedrock model {model_id}: {e}", exc_info=True)
+                return {}
+            
+            breaker.record_success(time.monotonic() - start_time)
             logger.info("Successfully received response from model")
+            if isinstance(response_body.get('usage'), dict):
+                self._record_usage(span, response_body['usage'])
             return response_body
-        except Exception as e:
-            logger.error(f"Error invoking Bedrock model {model_id}: {e}", exc_info=True)
-            return {}
     
+    def _record_usage(self, span: tracing.Span, usage: Dict[str, Any]):
+        """Counts input tokens served from, written to and missing the prompt cache."""
+        counts = {
+            'input_tokens': usage.get('input_tokens') or 0,
+            'cache_read_input_tokens': usage.get('cache_read_input_tokens') or 0,
+            'cache_creation_input_tokens': usage.get('cache_creation_input_tokens') or 0,
+            'output_tokens': usage.get('output_tokens') or 0,
+        }
+        with self._usage_lock:
+            self._usage.update(counts)
+            self._usage['calls'] += 1
+        for name, value in counts.items():
+            span.set_attribute(f"usage.{name}", value)
+        if counts['cache_read_input_tokens'] or counts['cache_creation_input_tokens']:
+            logger.info(
+                f"Prompt cache: {counts['cache_read_input_tokens']} tokens read, "
+                f"{counts['cache_creation_input_tokens']} written, {counts['input_tokens']} uncached "
+                f"(container hit rate {self.usage_stats()['cache_hit_rate']:.0%})"
+            )
+    
+    def usage_stats(self) -> Dict[str, Any]:
+        """
+        Token usage reported by Bedrock since this container started, with
+        the share of prompt tokens served from the prompt cache.
+        """
+        with self._usage_lock:
+            stats: Dict[str, Any] = dict(self._usage)
+        prompt_tokens = (
+            stats.get('input_tokens', 0)
+            + stats.get('cache_read_input_tokens', 0)
+            + stats.get('cache_creation_input_tokens', 0)
+        )
+        stats['cache_hit_rate'] = stats.get('cache_read_input_tokens', 0) / prompt_tokens if prompt_tokens else 0.0
+        return stats
+    
+    def _messages_body(self, system_prompt: str, user_content: str, max_tokens: int) -> Dict[str, Any]:
+        """
+        Anthropic messages body with the static instructions as the system
+        prompt. The system prompt is marked as a cache checkpoint only when
+        the model supports prompt caching and the prompt reaches its minimum
+        cacheable length; the current tone and rationale prompts are shorter.
+        """
+        system_block: Dict[str, Any] = {"type": "text", "text": system_prompt}
+        if (
+            self.prompt_cache_min_tokens is not None
+            and token_budget.estimate_tokens(system_prompt) >= self.prompt_cache_min_tokens
+        ):
+            system_block["cache_control"] = {"type": "ephemeral"}
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "system": [system_block],
+            "messages": [{"role": "user", "content": user_content}]
+        }
+    
+    @tracing.traced("bedrock.get_embedding")
     def get_embedding(self, text: str) -> List[float]:
-        """Generates an embedding for the given text."""
+        """
+        Generates a query embedding for the given text.
+        With EMBED_MICROBATCH, concurrent calls are coalesced into one Bedrock request.
+        """
         logger.info(f"Getting embedding for text: '{text[:50]}...'")
-        body = {"texts": [text], "input_type": "search_query"}
-        response_body = self._invoke_model(settings.BEDROCK_EMBED_MODEL_ID, body)
-        return response_body.get('embeddings', [[]])[0]
+        if self._query_batcher is not None:
+            return self._query_batcher(text)
+        return self.get_embeddings([text], input_type="search_query")[0]
     
-    def generate_complaint_text(self, user_prompt: str, tone: str = "formal") -> str:
-        """Generates a complaint text from a user's prompt with specified tone."""
+    @tracing.traced("bedrock.get_embeddings")
+    def get_embeddings(self, texts: List[str], input_type: str = "search_document") -> List[List[float]]:
+        """
+        Generates embeddings for many texts, EMBED_BATCH_SIZE texts per Bedrock call.
+        Returns one vector per text, in order; texts in a failed call get an empty list.
+        """
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), settings.EMBED_BATCH_SIZE):
+            chunk = texts[start:start + settings.EMBED_BATCH_SIZE]
+            body = {"texts": chunk, "input_type": input_type, "truncate": "END"}
+            vectors = self._invoke_model(settings.BEDROCK_EMBED_MODEL_ID, body).get('embeddings') or []
+            if len(vectors) != len(chunk):
+                vectors = [[] for _ in chunk]
+            embeddings.extend(vectors)
+        tracing.get_current_span().set_attribute("embed.texts", len(texts))
+        return embeddings
+    
+    @tracing.traced("bedrock.generate_complaint_text")
+    def generate_complaint_text(self, user_prompt: str, tone: str = "formal", agency_name: Optional[str] = None) -> Generation:
+        """
+        Generates a complaint text from a user's prompt with specified tone.
+        Falls back to a local tone template when Bedrock is unavailable.
+        """
         logger.info(f"Generating complaint text with tone: {tone}")
         
-        # Select prompt based on tone
-        if tone == "funny":
-            prompt_template = prompts.COMPLAINT_GENERATION_PROMPT_FUNNY
-        elif tone == "angry":
-            prompt_template = prompts.COMPLAINT_GENERATION_PROMPT_ANGRY
-        else:  # default to formal
-            prompt_template = prompts.COMPLAINT_GENERATION_PROMPT_FORMAL
-        
-        prompt = prompt_template.format(user_prompt=user_prompt)
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 512,  # Reduced from 1024 for cost optimization
-            "messages": [{"role": "user", "content": prompt}]
-        }
+        # Select prompt based on tone, defaulting to formal
+        system_prompt = prompts.COMPLAINT_SYSTEM_PROMPTS.get(tone, prompts.COMPLAINT_SYSTEM_PROMPT_FORMAL)
+        body = self._messages_body(
+            system_prompt,
+            prompts.COMPLAINT_USER_PROMPT.format(user_prompt=user_prompt),
+            max_tokens=512  # Reduced from 1024 for cost optimization
+        )
         response_body = self._invoke_model(settings.BEDROCK_GENERATE_MODEL_ID, body)
         if response_body and 'content' in response_body and response_body['content']:
-            return response_body['content'][0].get('text', '').strip()
-        return ""
+            return Generation(response_body['content'][0].get('text', '').strip())
+        
+        tracing.get_current_span().set_attribute("fallback", True)
+        logger.warning("Using template fallback for complaint text")
+        return Generation(template_fallback.render_complaint_text(user_prompt, tone, agency_name), fallback=True)
     
-    def generate_rationale(self, user_prompt: str, ministry_name: str, ministry_desc: str) -> str:
-        """Generates a rationale for suggesting a specific ministry."""
+    @tracing.traced("bedrock.generate_rationale")
+    def generate_rationale(
+        self,
+        user_prompt: str,
+        ministry_name: str,
+        ministry_desc: str,
+        matched_keywords: Optional[List[str]] = None
+    ) -> Generation:
+        """
+        Generates a rationale for suggesting a specific ministry.
+        Falls back to a keyword-based rationale when Bedrock is unavailable,
+        built from `matched_keywords` (the words the agency was matched on) when given.
+        """
         logger.info(f"Generating rationale for ministry: {ministry_name}")
-        prompt = prompts.RATIONALE_GENERATION_PROMPT.format(
+        user_content = prompts.RATIONALE_USER_PROMPT.format(
             user_prompt=user_prompt,
             ministry_name=ministry_name,
             ministry_desc=ministry_desc
         )
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 256,  # Reduced from 512 for cost optimization
-            "messages": [{"role": "user", "content": prompt}]
-        }
+        body = self._messages_body(
+            prompts.RATIONALE_SYSTEM_PROMPT,
+            user_content,
+            max_tokens=256  # Reduced from 512 for cost optimization
+        )
         response_body = self._invoke_model(settings.BEDROCK_GENERATE_MODEL_ID, body)
         if response_body and 'content' in response_body and response_body['content']:
-            return response_body['content'][0].get('text', '').strip()
-        return ""
+            return Generation(response_body['content'][0].get('text', '').strip())
+        
+        tracing.get_current_span().set_attribute("fallback", True)
+        logger.warning("Using template fallback for rationale")
+        return Generation(
+            template_fallback.render_rationale(user_prompt, ministry_name, ministry_desc, keywords=matched_keywords),
+            fallback=True
+        )
@@ -5,15 +5,20 @@ import boto3
 from botocore.config import Config
 
 from config import settings
+from services import tracing
 
 logger = logging.getLogger(__name__)
 
 class CacheService:
     def __init__(self):
-        retry_config = Config(retries={'max_attempts': 5, 'mode': 'adaptive'})
+        retry_config = Config(
+            retries={'max_attempts': 5, 'mode': 'adaptive'},
+            max_pool_connections=settings.HTTP_POOL_CONNECTIONS
+        )
         dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION, config=retry_config)
         self.table = dynamodb.Table(settings.CACHE_TABLE_NAME)
     
+    @tracing.traced("cache.get")
     def get(self, ministry_name: str) -> Optional[Dict[str, str]]:
         """Retrieves a cached social handle for a ministry."""
         try:
@@ -28,6 +33,7 @@ class CacheService:
         logger.info(f"CACHE MISS for '{ministry_name}'")
         return None
     
+    @tracing.traced("cache.put")
     def put(self, ministry_name: str, handle: str, status: str = 'verified'):
         """Caches a social handle for a ministry."""
         logger.info(f"Caching handle for '{ministry_name}'")
@@ -0,0 +1,118 @@
+"""
+Circuit breaker for downstream model calls
+Tracks error rate and slow calls per container so an outage fails fast
+"""
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker.
+
+    Calls that raise or take longer than `slow_call_seconds` count as failures.
+    Once at least `minimum_calls` outcomes in the window reach
+    `failure_rate_threshold`, the breaker opens and rejects calls for
+    `open_seconds`. It then half-opens and lets `half_open_max_calls` probes
+    through: a successful probe closes it, a failed probe re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        minimum_calls: int = 5,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Returns True if a call may proceed, False to fail fast."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                logger.info(f"Circuit '{self.name}' half-open, probing")
+                return True
+            return False
+
+    def record_success(self, duration: float):
+        """Records a completed call; slow calls are treated as failures."""
+        self._record(failed=duration >= self.slow_call_seconds)
+
+    def record_failure(self, duration: float = 0.0):
+        """Records a call that raised or returned an error."""
+        self._record(failed=True)
+
+    def _record(self, failed: bool):
+        with self._lock:
+            now = self._clock()
+            if self._state == STATE_HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if failed:
+                    self._open(now)
+                else:
+                    logger.info(f"Circuit '{self.name}' closed after successful probe")
+                    self._state = STATE_CLOSED
+                    self._outcomes.clear()
+                return
+            if self._state == STATE_OPEN:
+                # Late result from a call admitted before the breaker opened
+                return
+
+            self._outcomes.append((now, failed))
+            self._prune(now)
+            if len(self._outcomes) >= self.minimum_calls:
+                failures = sum(1 for _, f in self._outcomes if f)
+                if failures / len(self._outcomes) >= self.failure_rate_threshold:
+                    self._open(now)
+
+    def _open(self, now: float):
+        logger.warning(f"Circuit '{self.name}' opened for {self.open_seconds:.0f}s")
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._half_open_in_flight = 0
+        self._outcomes.clear()
+
+    def _maybe_half_open(self):
+        if self._state == STATE_OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._half_open_in_flight = 0
+
+    def _prune(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
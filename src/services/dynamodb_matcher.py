@@ -2,34 +2,112 @@
 DynamoDB-based agency matching service
 Replaces Pinecone for cost optimization
 """
+import time
+import logging
+import threading
 import boto3
-from typing import List, Dict, Tuple
+from collections import Counter
+from botocore.config import Config
+from typing import List, Dict, Tuple, Optional
+
+from config import settings
+from models import AgencyRecord, Ministry
+from services import tracing
+from services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Item bumped by the agency loaders whenever the table contents change
+DATA_VERSION_KEY = 'meta#version'
+
+# Matched keywords needed for full confidence
+CONFIDENCE_FULL_HITS = 3
 
 class DynamoDBMatcher:
-    def __init__(self, region='ap-southeast-2'):
-        self.dynamodb = boto3.resource('dynamodb', region_name=region)
+    def __init__(self, region='ap-southeast-2', dynamodb=None):
+        self.dynamodb = dynamodb or boto3.resource(
+            'dynamodb',
+            region_name=region,
+            config=Config(max_pool_connections=settings.HTTP_POOL_CONNECTIONS)
+        )
         self.table = self.dynamodb.Table('agencies')
+        self._memo = TTLCache(settings.MATCH_CACHE_SIZE, settings.MATCH_CACHE_TTL_SECONDS)
+        # Interned agency records shared by every match result
+        self._agencies = TTLCache(settings.AGENCY_STORE_SIZE, settings.MATCH_CACHE_TTL_SECONDS)
+        self._data_version: Optional[str] = None
+        self._version_checked_at = 0.0
+        self._version_lock = threading.Lock()
+    
+    @staticmethod
+    def extract_keywords(complaint_text: str) -> Tuple[str, ...]:
+        """
+        Sorted, deduplicated keywords (simple tokenization).
+        Long inputs keep only the MAX_MATCH_KEYWORDS most frequent ones so
+        the number of index queries stays bounded.
+        """
+        counts = Counter(t for t in complaint_text.lower().split() if len(t) > 3)
+        return tuple(sorted(k for k, _ in counts.most_common(settings.MAX_MATCH_KEYWORDS)))
     
-    def match_agencies(self, complaint_text: str, top_k: int = 3) -> List[Dict]:
+    def _check_data_version(self):
+        """Clears the memo when the agencies data version changes (checked at most every MATCH_VERSION_CHECK_SECONDS)"""
+        now = time.monotonic()
+        with self._version_lock:
+            if now - self._version_checked_at < settings.MATCH_VERSION_CHECK_SECONDS:
+                return
+            self._version_checked_at = now
+        try:
+            item = self.table.get_item(Key={'agency_id': DATA_VERSION_KEY}).get('Item', {})
+        except Exception as e:
+            logger.warning(f"Error reading agencies data version: {e}")
+            return
+        version = item.get('version')
+        if version != self._data_version:
+            if self._data_version is not None:
+                logger.info(f"Agencies data version changed to {version}, clearing match memo")
+            self._data_version = version
+            self._memo.clear()
+            self._agencies.clear()
+    
+    @tracing.traced("dynamodb.match_agencies")
+    def match_agencies(self, complaint_text: str, top_k: int = 3) -> List[Ministry]:
         """
-        Match complaint to agencies using keyword matching
+        Match complaint to agencies using keyword matching.
+        Results are memoized on the keyword signature, so phrasings that
+        reduce to the same keyword set skip DynamoDB entirely. Results are
+        immutable, so memo hits are returned without copying.
         
         Args:
             complaint_text: User's complaint
             top_k: Number of top matches to return
             
         Returns:
-            List of matched agencies with scores
+            List of matched agencies with scores and the keywords that matched
         """
-        # Extract keywords (simple tokenization)
-        tokens = complaint_text.lower().split()
-        keywords = [t for t in tokens if len(t) > 3]
+        keywords = self.extract_keywords(complaint_text)
         
         if not keywords:
             return []
         
+        self._check_data_version()
+        memo_key = (keywords, top_k)
+        cached = self._memo.get(memo_key)
+        tracing.get_current_span().set_attribute("memo.hit", cached is not None)
+        if cached is not None:
+            logger.info(f"Match memo hit for {len(keywords)} keywords")
+            return list(cached)
+        
+        results, complete = self._match_keywords(keywords, top_k)
+        if complete:
+            # Partial results from a failed query are not memoized
+            self._memo.put(memo_key, results)
+        return list(results)
+    
+    def _match_keywords(self, keywords: Tuple[str, ...], top_k: int) -> Tuple[List[Ministry], bool]:
+        """Queries the keyword index and hydrates the top agencies; also reports whether every call succeeded"""
         # Query DynamoDB for each keyword
         matches = {}
+        matched_keywords = {}
+        complete = True
         for keyword in keywords:
             try:
                 response = self.table.query(
@@ -42,36 +120,105 @@ class DynamoDBMatcher:
                     agency_id = item.get('agency_ref', item.get('agency_id'))
                     if agency_id and not agency_id.startswith('keyword#'):
                         matches[agency_id] = matches.get(agency_id, 0) + 1
+                        matched_keywords.setdefault(agency_id, []).append(keyword)
             except Exception as e:
-                print(f"Error querying keyword {keyword}: {e}")
+                logger.error(f"Error querying keyword {keyword}: {e}")
+                complete = False
                 continue
         
         if not matches:
-            return []
+            return [], complete
         
         # Sort by match count
         sorted_matches = sorted(matches.items(), key=lambda x: x[1], reverse=True)
         
         # Fetch full agency details for top matches
+        top_matches = sorted_matches[:top_k]
+        agencies, fetched_all = self._get_agencies([agency_id for agency_id, _ in top_matches])
+        complete = complete and fetched_all
+        
         results = []
-        for agency_id, match_count in sorted_matches[:top_k]:
+        for agency_id, match_count in top_matches:
+            agency = agencies.get(agency_id)
+            if agency is None:
+                continue
+            score = match_count / len(keywords)
+            
+            results.append(Ministry(
+                name=agency.name,
+                score=float(score),
+                description=f"{agency.level} level agency",
+                agency=agency,
+                matched_keywords=tuple(matched_keywords[agency_id]),
+                match_confidence=_match_confidence(agency_id, matched_keywords)
+            ))
+        
+        return results, complete
+    
+    def _get_agencies(self, agency_ids: List[str]) -> Tuple[Dict[str, AgencyRecord], bool]:
+        """
+        Returns interned agency records, fetching the ones not yet in the store
+        in one BatchGetItem round trip (falling back to GetItem)
+        """
+        agencies: Dict[str, AgencyRecord] = {}
+        missing = []
+        for agency_id in agency_ids:
+            record = self._agencies.get(agency_id)
+            if record is None:
+                missing.append(agency_id)
+            else:
+                agencies[agency_id] = record
+        if not missing:
+            return agencies, True
+        
+        try:
+            response = self.dynamodb.batch_get_item(
+                RequestItems={self.table.name: {'Keys': [{'agency_id': agency_id} for agency_id in missing]}}
+            )
+            for item in response.get('Responses', {}).get(self.table.name, []):
+                agencies[item['agency_id']] = self._intern(item)
+            unprocessed = response.get('UnprocessedKeys', {}).get(self.table.name, {}).get('Keys', [])
+        except Exception as e:
+            logger.warning(f"Error batch fetching agencies, falling back to GetItem: {e}")
+            unprocessed = [{'agency_id': agency_id} for agency_id in missing]
+        
+        complete = True
+        for key in unprocessed:
             try:
-                response = self.table.get_item(Key={'agency_id': agency_id})
+                response = self.table.get_item(Key=key)
                 if 'Item' in response:
-                    agency = response['Item']
-                    score = match_count / len(keywords)
-                    
-                    results.append({
-                        'name': agency.get('name', ''),
-                        'score': float(score),
-                        'description': f"{agency.get('level', '')} level agency",
-                        'social_media': agency.get('social_media', {}),
-                        'website': agency.get('website'),
-                        'phone': agency.get('phone'),
-                        'email': agency.get('email')
-                    })
+                    agencies[key['agency_id']] = self._intern(response['Item'])
             except Exception as e:
-                print(f"Error fetching agency {agency_id}: {e}")
-                continue
-        
-        return results
+                logger.error(f"Error fetching agency {key['agency_id']}: {e}")
+                complete = False
+        return agencies, complete
+    
+    def _intern(self, item: Dict) -> AgencyRecord:
+        record = AgencyRecord.from_item(item)
+        self._agencies.put(record.agency_id, record)
+        return record
+
+
+def _match_confidence(agency_id: str, matched_keywords: Dict[str, List[str]]) -> float:
+    """
+    Confidence (0-1) that `agency_id` is the right agency.
+    Agencies matching exactly the same keywords (the same dinas in each city,
+    or a dinas and its ministry) don't compete with each other, so the margin
+    is taken over the best agency that matched a different keyword set. It is
+    scaled by how many keywords matched, so a single generic hit ("rumah")
+    stays low even when nothing competes with it.
+    """
+    own = set(matched_keywords[agency_id])
+    competing_hits = max(
+        (len(keywords) for other_id, keywords in matched_keywords.items() if set(keywords) != own),
+        default=0
+    )
+    margin = max(0, len(own) - competing_hits) / len(own)
+    return margin * min(1.0, len(own) / CONFIDENCE_FULL_HITS)
+
+
+def keyword_confidence(contacts: List[Ministry]) -> float:
+    """Confidence (0-1) that the top keyword match is the right agency."""
+    if not contacts:
+        return 0.0
+    return contacts[0].match_confidence or 0.0
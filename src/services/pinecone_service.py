@@ -1,8 +1,10 @@
 import logging
-from typing import List, Dict
+from typing import List
 from pinecone import Pinecone
 
 from config import settings
+from models import Ministry
+from services import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +13,8 @@ class PineconeService:
         pc = Pinecone(api_key=settings.PINECONE_API_KEY)
         self.index = pc.Index(settings.PINECONE_INDEX_NAME)
     
-    def find_relevant_ministries(self, embedding: List[float], top_k: int = 3) -> List[Dict]:
+    @tracing.traced("pinecone.find_relevant_ministries")
+    def find_relevant_ministries(self, embedding: List[float], top_k: int = 3) -> List[Ministry]:
         """Queries Pinecone to find relevant government ministries."""
         logger.info(f"Querying Pinecone for top {top_k} matches")
         query_response = self.index.query(
@@ -21,13 +24,13 @@ class PineconeService:
         )
         
         ministries = [
-            {
-                "name": match['metadata']['name'],
-                "score": match['score'],
-                "description": match['metadata'].get('text_content', '')
-            }
+            Ministry(
+                name=match['metadata']['name'],
+                score=match['score'],
+                description=match['metadata'].get('text_content', '')
+            )
             for match in query_response.get('matches', [])
         ]
         
-        logger.info(f"Found ministries: {[m['name'] for m in ministries]}")
+        logger.info(f"Found ministries: {[m.name for m in ministries]}")
         return ministries
@@ -0,0 +1,74 @@
+"""
+Hybrid retrieval: confidence-gated semantic search and reciprocal rank
+fusion of keyword and vector results
+"""
+import re
+import logging
+from typing import Callable, Dict, List
+
+from config import settings
+from models import Ministry
+from services import tracing
+from services.dynamodb_matcher import keyword_confidence
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def agency_key(name: str) -> str:
+    """Normalizes agency names so the same agency from different sources dedupes."""
+    key = _NON_ALNUM.sub(" ", name.lower()).strip()
+    if key.endswith(" indonesia"):
+        key = key[:-len(" indonesia")]
+    return key
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Ministry]], top_k: int = 3, k: int = 60) -> List[Ministry]:
+    """
+    Merges ranked contact lists into one deduplicated ranking.
+
+    Each contact scores sum(1 / (k + rank)) over the lists it appears in. When
+    an agency appears in several lists the entry from the earliest list is
+    kept, so richer keyword results (social media, phone) win over vector
+    results. Scores are normalized to 0-1 against a first place in every list.
+    """
+    fused: Dict[str, float] = {}
+    entries: Dict[str, Ministry] = {}
+    for contacts in ranked_lists:
+        for rank, contact in enumerate(contacts, 1):
+            key = agency_key(contact.name)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+            entries.setdefault(key, contact)
+
+    best_possible = len(ranked_lists) / (k + 1)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [entries[key].with_score(score / best_possible) for key, score in ranked]
+
+
+@tracing.traced("hybrid_contacts")
+def hybrid_contacts(
+    user_prompt: str,
+    keyword_contacts: List[Ministry],
+    semantic: Callable[[str, int], List[Ministry]],
+    top_k: int = 3
+) -> List[Ministry]:
+    """
+    Completes hybrid retrieval from the keyword matches.
+    `semantic(user_prompt, top_k)` only runs when RETRIEVAL_MODE is hybrid
+    and keyword confidence is below HYBRID_CONFIDENCE_THRESHOLD (or nothing
+    matched); both rankings are then merged with reciprocal rank fusion.
+    """
+    confidence = keyword_confidence(keyword_contacts)
+    logger.info(f"DynamoDB matched {len(keyword_contacts)} agencies (confidence {confidence:.2f})")
+    
+    if keyword_contacts and (
+        settings.RETRIEVAL_MODE != "hybrid" or confidence >= settings.HYBRID_CONFIDENCE_THRESHOLD
+    ):
+        return keyword_contacts
+    
+    logger.info("Keyword confidence low, running semantic retrieval")
+    vector_contacts = semantic(user_prompt, top_k)
+    if not keyword_contacts:
+        return vector_contacts
+    return reciprocal_rank_fusion([keyword_contacts, vector_contacts], top_k=top_k, k=settings.RRF_K)
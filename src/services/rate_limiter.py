@@ -0,0 +1,182 @@
+"""
+Admission control: per-client token buckets and in-flight load shedding
+
+Buckets live in DynamoDB and are updated with conditional writes, so every
+Lambda container (or server worker) enforces the same per-client limit.
+InMemoryBucketStore is the local stand-in for tests and single-process runs.
+
+Load shedding uses a per-process count of in-flight Bedrock calls, so it is
+only meaningful in server mode, where one worker serves many requests at
+once. A Lambda container runs one invocation at a time; cap concurrency
+there with reserved concurrency instead.
+"""
+import math
+import time
+import hashlib
+import logging
+import threading
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bucket state: (tokens, updated_at epoch seconds)
+BucketState = Tuple[float, float]
+
+
+class InMemoryBucketStore:
+    def __init__(self):
+        self._buckets: Dict[str, BucketState] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[BucketState]:
+        with self._lock:
+            return self._buckets.get(key)
+
+    def compare_and_set(self, key: str, expected: Optional[BucketState], new: BucketState, ttl_seconds: float) -> bool:
+        with self._lock:
+            if self._buckets.get(key) != expected:
+                return False
+            self._buckets[key] = new
+            return True
+
+
+class DynamoDBBucketStore:
+    """
+    Table keyed on `client_key` with `tokens`, `updated_at` and `expires_at`
+    (DynamoDB TTL attribute, so idle buckets disappear on their own).
+    """
+
+    def __init__(self, table: Any):
+        self.table = table
+
+    def get(self, key: str) -> Optional[BucketState]:
+        item = self.table.get_item(Key={'client_key': key}, ConsistentRead=True).get('Item')
+        if item is None:
+            return None
+        return float(item['tokens']), float(item['updated_at'])
+
+    def compare_and_set(self, key: str, expected: Optional[BucketState], new: BucketState, ttl_seconds: float) -> bool:
+        values = {
+            ':tokens': Decimal(str(round(new[0], 6))),
+            ':now': Decimal(str(round(new[1], 6))),
+            ':expires': int(new[1] + ttl_seconds)
+        }
+        if expected is None:
+            condition = 'attribute_not_exists(client_key)'
+        else:
+            condition = 'updated_at = :prev'
+            values[':prev'] = Decimal(str(round(expected[1], 6)))
+        try:
+            self.table.update_item(
+                Key={'client_key': key},
+                UpdateExpression='SET tokens = :tokens, updated_at = :now, expires_at = :expires',
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+
+class TokenBucketLimiter:
+    """
+    Allows `capacity` requests in a burst, refilled at `refill_per_second`.
+    Concurrent updates to the same bucket are resolved by compare-and-set
+    retries; if the store is unreachable the request is allowed (fail open).
+    """
+
+    def __init__(self, store: Any, capacity: float, refill_per_second: float,
+                 clock: Callable[[], float] = time.time, max_attempts: int = 3):
+        self.store = store
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_attempts = max_attempts
+        self._clock = clock
+
+    def acquire(self, key: str) -> Tuple[bool, float]:
+        """Takes one token for `key`. Returns (allowed, seconds until a token is available)."""
+        # Idle buckets are full again after this long, so the row can expire
+        ttl_seconds = self.capacity / self.refill_per_second
+        try:
+            for _ in range(self.max_attempts):
+                now = self._clock()
+                state = self.store.get(key)
+                if state is None:
+                    tokens = float(self.capacity)
+                else:
+                    tokens = min(self.capacity, state[0] + max(0.0, now - state[1]) * self.refill_per_second)
+                if tokens < 1:
+                    return False, (1 - tokens) / self.refill_per_second
+                if self.store.compare_and_set(key, state, (tokens - 1, now), ttl_seconds):
+                    return True, 0.0
+            # Lost every race: the bucket is being hammered concurrently
+            return False, 1.0 / self.refill_per_second
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, allowing request: {e}")
+            return True, 0.0
+
+
+class InFlightGauge:
+    """Counts calls currently in progress (e.g. Bedrock invocations in this container)."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def __enter__(self):
+        with self._lock:
+            self._value += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            self._value -= 1
+        return False
+
+
+# Bedrock calls in progress in this process (complaint generation, rationale,
+# embeddings and the in-process social finder)
+bedrock_in_flight = InFlightGauge()
+
+
+def limiter_from_settings() -> Optional[TokenBucketLimiter]:
+    """The per-client limiter configured by RATE_LIMIT_* settings, or None when disabled."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        store = InMemoryBucketStore()
+    else:
+        dynamodb = boto3.resource(
+            'dynamodb',
+            region_name=settings.AWS_REGION,
+            config=Config(max_pool_connections=settings.HTTP_POOL_CONNECTIONS)
+        )
+        store = DynamoDBBucketStore(dynamodb.Table(settings.RATE_LIMIT_TABLE_NAME))
+    return TokenBucketLimiter(store, settings.RATE_LIMIT_BURST, settings.RATE_LIMIT_PER_MINUTE / 60.0)
+
+
+def client_key(event: Dict[str, Any]) -> str:
+    """Rate-limit key for an API Gateway event: the API key (hashed) if sent, otherwise the source IP."""
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    api_key = headers.get('x-api-key')
+    if api_key:
+        return 'api#' + hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:32]
+    source_ip = event.get('requestContext', {}).get('http', {}).get('sourceIp')
+    return f"ip#{source_ip or 'unknown'}"
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
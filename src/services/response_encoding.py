@@ -0,0 +1,80 @@
+"""
+HTTP response compression and cache validators
+"""
+import gzip
+import base64
+import hashlib
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # optional dependency; gzip is always available
+    brotli = None
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Picks br or gzip from an Accept-Encoding header (q=0 excluded), preferring br."""
+    offered = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name] = q
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: str, encoding: str) -> str:
+    """Compresses a body and returns it base64-encoded for an API Gateway response."""
+    raw = body.encode("utf-8")
+    if encoding == "br":
+        data = brotli.compress(raw, quality=5)
+    else:
+        data = gzip.compress(raw, compresslevel=6)
+    return base64.b64encode(data).decode("ascii")
+
+
+def etag(body: str) -> str:
+    """Strong ETag derived from the response body."""
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], current: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return current in candidates
+
+
+def encode_body(
+    body: str,
+    encoding: Optional[str],
+    min_bytes: int,
+    variants: Optional[Dict[str, str]] = None
+) -> Dict[str, object]:
+    """
+    Returns the body fields of a Lambda proxy response, compressed when the
+    client accepts it and the body is at least min_bytes. `variants` caches
+    compressed bodies by encoding (e.g. on a result cache entry).
+    """
+    if encoding is None or len(body) < min_bytes:
+        return {"body": body, "isBase64Encoded": False, "headers": {}}
+    if variants is not None and encoding in variants:
+        compressed = variants[encoding]
+    else:
+        compressed = compress(body, encoding)
+        if variants is not None:
+            variants[encoding] = compressed
+    return {"body": compressed, "isBase64Encoded": True, "headers": {"Content-Encoding": encoding}}
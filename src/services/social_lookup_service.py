@@ -1,55 +1,107 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 import boto3
 from botocore.config import Config
 
 from config import settings
+from models import SocialHandleInfo
+from services import tracing
 from services.cache_service import CacheService
 
 logger = logging.getLogger(__name__)
 
-class SocialLookupService:
+class LambdaFinderBackend:
+    """Runs the finder as the separate BijakMengeluhSocialFinderFunction Lambda."""
+    
     def __init__(self):
-        retry_config = Config(retries={'max_attempts': 5, 'mode': 'adaptive'})
+        retry_config = Config(
+            retries={'max_attempts': 5, 'mode': 'adaptive'},
+            max_pool_connections=settings.HTTP_POOL_CONNECTIONS
+        )
         self.lambda_client = boto3.client('lambda', region_name=settings.AWS_REGION, config=retry_config)
-        self.cache = CacheService()
     
-    def _invoke_finder_lambda(self, ministry_name: str) -> Dict[str, str]:
+    @tracing.traced("lambda.invoke_finder")
+    def find(self, ministry_name: str) -> Dict[str, str]:
         """Invokes the finder Lambda function to search for a social handle."""
         logger.info(f"Invoking finder Lambda for '{ministry_name}'")
         try:
-            payload = json.dumps({"ministry_name": ministry_name})
+            # Carries the trace context so the finder's spans join this trace
+            payload = json.dumps(tracing.inject({"ministry_name": ministry_name}))
             response = self.lambda_client.invoke(
                 FunctionName=settings.FINDER_FUNCTION_NAME,
                 InvocationType='RequestResponse',
                 Payload=payload
             )
             response_payload = json.loads(response['Payload'].read().decode('utf-8'))
+            if 'FunctionError' in response or response_payload.get('statusCode', 200) >= 500:
+                logger.error(f"Finder Lambda failed: {response_payload}")
+                return {"handle": "NOT_FOUND", "status": "error"}
             body = json.loads(response_payload.get('body', '{}'))
             logger.info(f"Finder Lambda returned: {body}")
             return {
                 "handle": body.get('handle', 'NOT_FOUND'),
-                "confidence": body.get('confidence', 'none')
+                "confidence": body.get('confidence', 'none'),
+                "status": body.get('status', 'none')
             }
         except Exception as e:
             logger.error(f"Error invoking finder Lambda: {e}", exc_info=True)
             return {"handle": "NOT_FOUND", "status": "error"}
+
+
+class InProcessFinderBackend:
+    """
+    Calls find_social_handle directly on a background thread, reusing the
+    finder module's pooled Serper session and Bedrock client. Avoids the
+    Lambda invoke, its payload double-encoding and a second cold start.
+    """
+    
+    def __init__(self):
+        # Imported lazily: the finder module creates its clients on import
+        from handlers.social_finder_handler import find_social_handle
+        self._find_social_handle = find_social_handle
+        self._executor = ThreadPoolExecutor(max_workers=settings.FINDER_THREADS, thread_name_prefix='finder')
+    
+    @tracing.traced("finder.in_process")
+    def find(self, ministry_name: str) -> Dict[str, str]:
+        logger.info(f"Running finder in-process for '{ministry_name}'")
+        future = self._executor.submit(tracing.bind(self._find_social_handle), ministry_name)
+        try:
+            return future.result(timeout=settings.FINDER_TIMEOUT_SECONDS)
+        except TimeoutError:
+            logger.warning(f"Finder timed out after {settings.FINDER_TIMEOUT_SECONDS}s for '{ministry_name}'")
+        except Exception as e:
+            logger.error(f"Error running finder in-process: {e}", exc_info=True)
+        return {"handle": "NOT_FOUND", "status": "error"}
+
+
+FINDER_BACKENDS = {
+    "lambda": LambdaFinderBackend,
+    "inprocess": InProcessFinderBackend,
+}
+
+
+class SocialLookupService:
+    def __init__(self, finder=None):
+        self.finder = finder or FINDER_BACKENDS[settings.FINDER_BACKEND]()
+        self.cache = CacheService()
     
-    def get_social_handle(self, ministry_name: str) -> Dict[str, str]:
+    @tracing.traced("social_lookup.get_social_handle")
+    def get_social_handle(self, ministry_name: str) -> SocialHandleInfo:
         """
         Retrieves a ministry's social media handle using cache-aside pattern.
         1. Check cache
-        2. If miss, invoke finder Lambda
+        2. If miss, run the finder (in-process or Lambda, per FINDER_BACKEND)
         3. Cache high-confidence results
         """
         # Check cache first
         cached_item = self.cache.get(ministry_name)
         if cached_item:
-            return {"handle": cached_item['handle'], "status": cached_item['status']}
+            return SocialHandleInfo(handle=cached_item['handle'], status=cached_item['status'])
         
         # Cache miss - invoke finder
-        finder_result = self._invoke_finder_lambda(ministry_name)
+        finder_result = self.finder.find(ministry_name)
         handle = finder_result.get('handle')
         confidence = finder_result.get('confidence')
         
@@ -58,6 +110,6 @@ class SocialLookupService:
             status = 'verified' if confidence == 'high' else 'unverified'
             if status == 'verified':
                 self.cache.put(ministry_name, handle, status)
-            return {"handle": handle, "status": status}
+            return SocialHandleInfo(handle=handle, status=status)
         
-        return {"handle": "NOT_FOUND", "status": finder_result.get("status", "none")}
+        return SocialHandleInfo(handle="NOT_FOUND", status=finder_result.get("status", "none"))
@@ -0,0 +1,90 @@
+"""
+Deterministic local output used when Bedrock cannot be reached, and for
+the rationale of high-confidence keyword matches
+"""
+import re
+from typing import List, Optional
+
+from config import prompts
+
+MAX_COMPLAINT_CHARS = 280
+
+_WORD_RE = re.compile(r"[a-z0-9\-]+")
+
+STOPWORDS = {
+    "yang", "untuk", "dengan", "sudah", "belum", "tidak", "bukan", "sangat",
+    "dari", "pada", "akan", "juga", "saja", "kami", "kita", "saya", "mereka",
+    "ini", "itu", "atau", "karena", "tapi", "tetapi", "sejak", "masih",
+    "lagi", "banget", "tolong", "mohon", "depan", "dekat", "sekitar", "parah",
+    "hari", "minggu", "bulan", "tahun", "level", "agency", "dinas"
+}
+
+TONE_TEMPLATES = {
+    "formal": prompts.FALLBACK_COMPLAINT_TEMPLATE_FORMAL,
+    "funny": prompts.FALLBACK_COMPLAINT_TEMPLATE_FUNNY,
+    "angry": prompts.FALLBACK_COMPLAINT_TEMPLATE_ANGRY,
+}
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _shorten(text: str, limit: int = MAX_COMPLAINT_CHARS) -> str:
+    """Collapses whitespace and cuts at a word boundary."""
+    text = " ".join(text.split()).rstrip(".!?, ")
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(".!?, ") + "..."
+
+
+def render_complaint_text(user_prompt: str, tone: str = "formal", agency_name: Optional[str] = None) -> str:
+    """Fills the tone-specific template with the complaint and matched agency."""
+    template = TONE_TEMPLATES.get(tone, prompts.FALLBACK_COMPLAINT_TEMPLATE_FORMAL)
+    agency_mention = f" {agency_name}" if agency_name else ""
+    return template.format(agency_mention=agency_mention, complaint=_shorten(user_prompt))
+
+
+def complaint_keywords(user_prompt: str, ministry_name: str, ministry_desc: str, limit: int = 3) -> List[str]:
+    """
+    Picks the complaint words that best explain the match.
+    Words that also appear in the agency name or description come first,
+    followed by the remaining content words of the complaint.
+    """
+    agency_words = set(_words(f"{ministry_name} {ministry_desc}"))
+    overlapping, others = [], []
+    for word in _words(user_prompt):
+        if len(word) <= 3 or word in STOPWORDS or word in overlapping or word in others:
+            continue
+        (overlapping if word in agency_words else others).append(word)
+    return (overlapping + others)[:limit]
+
+
+def _quote_join(words: List[str]) -> str:
+    quoted = [f"'{w}'" for w in words]
+    return quoted[0] if len(quoted) == 1 else ", ".join(quoted[:-1]) + f" dan {quoted[-1]}"
+
+
+def render_rationale(
+    user_prompt: str,
+    ministry_name: str,
+    ministry_desc: str,
+    keywords: Optional[List[str]] = None,
+    functions: Optional[List[str]] = None
+) -> str:
+    """
+    Builds a keyword-based rationale following the RATIONALE_SYSTEM_PROMPT pattern.
+    `functions` are the agency's own indexed keywords; when given, the
+    sentence also names the responsibilities the complaint maps to.
+    """
+    keywords = keywords or complaint_keywords(user_prompt, ministry_name, ministry_desc)
+    if not keywords:
+        return prompts.FALLBACK_RATIONALE_TEMPLATE_GENERIC.format(ministry_name=ministry_name)
+    functions = [f for f in (functions or []) if f not in keywords][:2]
+    if functions:
+        return prompts.TEMPLATED_RATIONALE_TEMPLATE.format(
+            ministry_name=ministry_name,
+            keywords=_quote_join(keywords),
+            functions=_quote_join(functions)
+        )
+    return prompts.FALLBACK_RATIONALE_TEMPLATE.format(ministry_name=ministry_name, keywords=_quote_join(keywords))
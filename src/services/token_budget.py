@@ -0,0 +1,137 @@
+"""
+Input token budget for complaint text
+
+Estimates tokens locally, rejects inputs far over budget, and trims the rest
+with sentence-aware extraction that keeps the sentences containing matched
+keywords, so prompt sizes stay bounded whatever users paste.
+"""
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Conservative for Indonesian text under the Claude / Cohere tokenizers
+CHARS_PER_TOKEN = 3.5
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)")
+_CLAUSE_RE = re.compile(r"[^,;:]+(?:[,;:]+|$)")
+
+# Sentences longer than this share of the budget are split into clauses, then
+# word windows, so a run-on paragraph is ranked piece by piece
+SEGMENT_SHARE = 4
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count without calling a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.findall(text) if s.strip()]
+
+
+def split_segments(sentence: str, max_tokens: int) -> List[str]:
+    """Splits a sentence over max_tokens on , ; : and then into word windows of at most max_tokens."""
+    if estimate_tokens(sentence) <= max_tokens:
+        return [sentence]
+    limit = int(max_tokens * CHARS_PER_TOKEN)
+    segments: List[str] = []
+    for clause in _CLAUSE_RE.findall(sentence):
+        clause = clause.strip()
+        if len(clause) <= limit:
+            if clause:
+                segments.append(clause)
+            continue
+        window: List[str] = []
+        size = 0
+        for word in clause.split():
+            if window and size + 1 + len(word) > limit:
+                segments.append(" ".join(window))
+                window, size = [], 0
+            size += len(word) + (1 if window else 0)
+            window.append(word)
+        if window:
+            segments.append(" ".join(window))
+    return segments
+
+
+def _cut(text: str, max_tokens: int) -> str:
+    """Cuts text at a word boundary to fit max_tokens."""
+    limit = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(".,;: ") + "..."
+
+
+def trim_to_budget(text: str, keywords: Iterable[str] = (), max_tokens: Optional[int] = None) -> str:
+    """
+    Extractive trim to max_tokens.
+    The first sentence is kept for context, then sentences containing matched
+    keywords (most keywords first), then the remaining sentences in order.
+    Kept sentences are returned in their original order; sentences over a
+    quarter of the budget are ranked as clauses or word windows instead.
+    """
+    max_tokens = max_tokens or settings.MAX_INPUT_TOKENS
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    segment_tokens = max(1, max_tokens // SEGMENT_SHARE)
+    sentences = [segment for s in split_sentences(text) for segment in split_segments(s, segment_tokens)]
+    if not sentences:
+        return _cut(text, max_tokens)
+    # The lead sentence may use at most half the budget
+    sentences[0] = _cut(sentences[0], max_tokens // 2)
+    keywords = {k.lower() for k in keywords}
+
+    def keyword_hits(sentence: str) -> int:
+        return len(keywords.intersection(sentence.lower().split()))
+
+    order = [0] + sorted(range(1, len(sentences)), key=lambda i: (-keyword_hits(sentences[i]), i))
+    kept: List[int] = []
+    used = 0
+    for i in order:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        kept.append(i)
+        used += cost
+
+    return " ".join(sentences[i] for i in sorted(kept))
+
+
+def check(text: str) -> Tuple[str, int]:
+    """
+    Classifies an input against the budget.
+    Returns (action, estimated tokens) where action is "ok", "trim" or "reject".
+    """
+    tokens = estimate_tokens(text)
+    if tokens > settings.REJECT_INPUT_TOKENS:
+        action = "reject"
+    elif tokens > settings.MAX_INPUT_TOKENS:
+        action = "trim"
+    else:
+        action = "ok"
+    record(action)
+    if action != "ok":
+        logger.info(f"Input over token budget: ~{tokens} tokens, action={action}")
+    return action, tokens
+
+
+def record(action: str):
+    with _stats_lock:
+        _stats[action] += 1
+
+
+def stats() -> Dict[str, int]:
+    """Budget outcomes counted since this container started."""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,313 @@
+"""
+Lightweight span-based tracing with tail-based sampling
+
+The API mirrors the OpenTelemetry tracing API (get_tracer,
+start_as_current_span, set_attribute, record_exception, set_status) so the
+instrumentation can move to the OTel SDK without touching call sites.
+
+Spans are buffered per trace until the local root span ends. The trace is
+then exported if it was slow, had an error, or won the random sample (the
+random decision travels in the W3C `traceparent` flags so both Lambdas agree).
+"""
+import json
+import time
+import random
+import logging
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+
+
+class StatusCode:
+    UNSET = "UNSET"
+    OK = "OK"
+    ERROR = "ERROR"
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled", "is_remote")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool, is_remote: bool = False):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+        self.is_remote = is_remote
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional[SpanContext], attributes: Optional[Dict[str, Any]] = None):
+        self._tracer = tracer
+        self.name = name
+        self.parent = parent
+        trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        sampled = parent.sampled if parent else random.random() < tracer.sample_rate
+        self.context = SpanContext(trace_id, f"{random.getrandbits(64):016x}", sampled)
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status = StatusCode.UNSET
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+
+    @property
+    def is_local_root(self) -> bool:
+        return self.parent is None or self.parent.is_remote
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time or time.time_ns()
+        return (end - self.start_time) / 1e6
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def set_status(self, status: str, description: Optional[str] = None):
+        self.status = status
+        if description:
+            self.attributes["status.description"] = description
+
+    def record_exception(self, exception: BaseException):
+        self.events.append({
+            "name": "exception",
+            "time": time.time_ns(),
+            "exception.type": type(exception).__name__,
+            "exception.message": str(exception)
+        })
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            self._tracer._on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events
+        }
+
+
+class NonRecordingSpan:
+    """
+    What get_current_span() returns outside any span (OpenTelemetry's
+    INVALID_SPAN): it accepts the Span calls and records nothing.
+    """
+    __slots__ = ("context",)
+
+    def __init__(self):
+        self.context = SpanContext("0" * 32, "0" * 16, False)
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def set_status(self, status: str, description: Optional[str] = None):
+        pass
+
+    def record_exception(self, exception: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+INVALID_SPAN = NonRecordingSpan()
+
+
+class InMemorySpanExporter:
+    """Collects exported spans; used in tests and local runs."""
+
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class LoggingSpanExporter:
+    """Writes one JSON log line per span so traces can be queried by trace_id in CloudWatch Logs Insights."""
+
+    def export(self, spans: List[Span]):
+        for span in spans:
+            logger.info(json.dumps({"span": span.to_dict()}, default=str))
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(
+        self,
+        exporter: Any = None,
+        sample_rate: float = 0.0,
+        slow_threshold_ms: float = 3000.0,
+        max_buffered_traces: int = 256
+    ):
+        self.exporter = exporter or LoggingSpanExporter()
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_buffered_traces = max_buffered_traces
+        self.enabled = True
+        self._buffers: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, context: Optional[SpanContext] = None, attributes: Optional[Dict[str, Any]] = None) -> Span:
+        parent = context
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        return Span(self, name, parent, attributes)
+
+    def start_as_current_span(self, name: str, context: Optional[SpanContext] = None, attributes: Optional[Dict[str, Any]] = None):
+        return _SpanScope(self, name, context, attributes)
+
+    def _on_end(self, span: Span):
+        if not self.enabled:
+            return
+        trace_id = span.context.trace_id
+        with self._lock:
+            buffer = self._buffers.setdefault(trace_id, [])
+            buffer.append(span)
+            if not span.is_local_root:
+                # Drop the oldest unfinished traces rather than grow without bound
+                while len(self._buffers) > self.max_buffered_traces:
+                    self._buffers.popitem(last=False)
+                return
+            spans = self._buffers.pop(trace_id)
+
+        keep = (
+            span.context.sampled
+            or span.duration_ms >= self.slow_threshold_ms
+            or any(s.status == StatusCode.ERROR for s in spans)
+        )
+        if keep:
+            try:
+                self.exporter.export(spans)
+            except Exception as e:
+                logger.warning(f"Error exporting spans: {e}")
+
+
+class _SpanScope:
+    def __init__(self, tracer: Tracer, name: str, context: Optional[SpanContext], attributes: Optional[Dict[str, Any]]):
+        self._tracer = tracer
+        self._name = name
+        self._context = context
+        self._attributes = attributes
+        self._token = None
+        self.span: Optional[Span] = None
+
+    def __enter__(self) -> Span:
+        self.span = self._tracer.start_span(self._name, self._context, self._attributes)
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.span.record_exception(exc)
+            self.span.set_status(StatusCode.ERROR, str(exc))
+        _current_span.reset(self._token)
+        self.span.end()
+        return False
+
+
+_tracer = Tracer(sample_rate=settings.TRACE_SAMPLE_RATE, slow_threshold_ms=settings.TRACE_SLOW_MS)
+_tracer.enabled = settings.TRACING_ENABLED
+
+
+def configure(exporter: Any = None, sample_rate: Optional[float] = None, slow_threshold_ms: Optional[float] = None,
+              enabled: Optional[bool] = None) -> Tracer:
+    """Configures the process-wide tracer."""
+    if exporter is not None:
+        _tracer.exporter = exporter
+    if sample_rate is not None:
+        _tracer.sample_rate = sample_rate
+    if slow_threshold_ms is not None:
+        _tracer.slow_threshold_ms = slow_threshold_ms
+    if enabled is not None:
+        _tracer.enabled = enabled
+    return _tracer
+
+
+def get_tracer(name: str = __name__) -> Tracer:
+    return _tracer
+
+
+def get_current_span() -> Union[Span, NonRecordingSpan]:
+    """The active span, or INVALID_SPAN when called outside any span."""
+    span = _current_span.get()
+    return span if span is not None else INVALID_SPAN
+
+
+def traced(name: str):
+    """Decorator that runs the function inside a span named `name`."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracer.start_as_current_span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind(fn: Callable) -> Callable:
+    """Binds fn to the current trace context so spans it starts on another thread keep their parent."""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+
+def inject(carrier: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds a W3C traceparent for the current span to `carrier`."""
+    span = _current_span.get()
+    if span is not None:
+        flags = "01" if span.context.sampled else "00"
+        carrier[TRACEPARENT] = f"00-{span.context.trace_id}-{span.context.span_id}-{flags}"
+    return carrier
+
+
+def extract(carrier: Optional[Dict[str, Any]]) -> Optional[SpanContext]:
+    """Reads a W3C traceparent from `carrier` into a remote parent context."""
+    value = (carrier or {}).get(TRACEPARENT)
+    if not isinstance(value, str):
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], sampled, is_remote=True)